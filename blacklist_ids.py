@@ -0,0 +1,158 @@
+import asyncio
+import os
+from array import array
+from bisect import bisect_left
+from database import AsyncRedisDB
+from snapshot import DEFAULT_PATH, BlacklistSnapshot
+from utils import logutils
+from utils.pubsub import listen_forever
+
+logger = logutils.CustomLogger(__name__)
+
+class BlacklistedIdSet:
+    """
+    In-process set of blacklisted user IDs, kept as a sorted array of unsigned 64-bit
+    integers (8 bytes per ID) and searched with bisect, so membership checks for joining
+    members never touch Redis. Loaded at startup and kept current from the user change
+    announcements AsyncRedisDB publishes on every write, reloading after bulk changes.
+    When a snapshot file exists it is memory-mapped instead, and only the IDs changed since
+    its version are read from Redis: _ids then holds the additions and _removed the deletions.
+    """
+
+    def __init__(self, db=0, snapshot_path=DEFAULT_PATH):
+        self.db = AsyncRedisDB(db=db)
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._ids = array('Q')
+        self._removed = set()
+        self._ready = False
+        self._start_lock = asyncio.Lock()
+        self._listener = None
+
+    async def start(self):
+        """
+        Subscribes to user changes and loads the IDs. Safe to call more than once.
+        """
+        async with self._start_lock:
+            if self._listener is not None:
+                return
+            ready = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(ready))
+            await ready.wait()
+
+    async def _listen(self, ready):
+        async def subscribed():
+            await self.reload()
+            ready.set()
+
+        def failed():
+            self._ready = False
+            ready.set()
+
+        await listen_forever(self.db.redis, self.db.USER_CHANGES_CHANNEL.format(self.db.db), subscribed, self._refresh, failed)
+
+    async def reload(self):
+        """
+        Loads the IDs from the snapshot file plus later changes if there is one, otherwise from Redis.
+        """
+        snapshot = self._open_snapshot()
+        if snapshot is not None:
+            version, changed = await self.db.get_changes_since(snapshot.version)
+            if version >= snapshot.version:
+                await self._load_changes(snapshot, changed)
+                return
+            # Redis is behind the snapshot, so it was taken from other data.
+            logger.warning(f"Ignoring blacklist snapshot at version {snapshot.version}, Redis is at {version}")
+            snapshot.close()
+        # Read directly so a Redis error fails the reload instead of yielding an empty set.
+        user_ids = await self.db.redis.zrange(self.db.USERS_INDEX_KEY, 0, -1)
+        self._set_snapshot(None, array('Q', sorted(int(user_id) for user_id in user_ids if user_id.isdigit())), set())
+
+    def _open_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            return BlacklistSnapshot(self.snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error opening blacklist snapshot {self.snapshot_path}: {e}")
+            return None
+
+    async def _load_changes(self, snapshot, changed):
+        try:
+            async with self.db.redis.pipeline() as pipeline:
+                for user_id in changed:
+                    pipeline.zscore(self.db.USERS_INDEX_KEY, user_id)
+                scores = await pipeline.execute() if changed else []
+        except BaseException:
+            snapshot.close()
+            raise
+        added, removed = [], set()
+        for user_id, score in zip(changed, scores):
+            if not user_id.isdigit():
+                continue
+            if score is not None:
+                added.append(int(user_id))
+            elif int(user_id) in snapshot:
+                removed.add(int(user_id))
+        self._set_snapshot(snapshot, array('Q', sorted(added)), removed)
+
+    def _set_snapshot(self, snapshot, ids, removed):
+        previous = self._snapshot
+        self._snapshot, self._ids, self._removed = snapshot, ids, removed
+        self._ready = True
+        if previous is not None and previous is not snapshot:
+            previous.close()
+
+    async def _refresh(self, user_id):
+        if user_id == self.db.ALL_USERS_CHANGED:
+            await self.reload()
+            return
+        # Announcements carry only the ID, so look up whether it was added or removed.
+        if not user_id.isdigit():
+            return
+        if await self.db.redis.zscore(self.db.USERS_INDEX_KEY, user_id) is not None:
+            self._insert(int(user_id))
+        else:
+            self._remove(int(user_id))
+
+    def _insert(self, user_id):
+        self._removed.discard(user_id)
+        index = bisect_left(self._ids, user_id)
+        if index == len(self._ids) or self._ids[index] != user_id:
+            self._ids.insert(index, user_id)
+
+    def _remove(self, user_id):
+        index = bisect_left(self._ids, user_id)
+        if index < len(self._ids) and self._ids[index] == user_id:
+            del self._ids[index]
+        if self._snapshot is not None and user_id in self._snapshot:
+            self._removed.add(user_id)
+
+    async def contains(self, user_id):
+        if not self._ready:
+            await self.start()
+            if not self._ready:
+                return await self.db.exists(str(user_id))
+        user_id = int(user_id)
+        index = bisect_left(self._ids, user_id)
+        if index < len(self._ids) and self._ids[index] == user_id:
+            return True
+        return self._snapshot is not None and user_id not in self._removed and user_id in self._snapshot
+
+    def __len__(self):
+        if self._snapshot is None:
+            return len(self._ids)
+        # A changed ID can be both in the snapshot and re-added, so count the overlap once.
+        return len(self._snapshot) - len(self._removed) + sum(1 for user_id in self._ids if user_id not in self._snapshot)
+
+
+_blacklisted_ids = None
+
+def get_blacklisted_ids():
+    """
+    Returns the process-wide BlacklistedIdSet shared by all extensions.
+    """
+    global _blacklisted_ids
+    if _blacklisted_ids is None:
+        _blacklisted_ids = BlacklistedIdSet()
+    return _blacklisted_ids
@@ -0,0 +1,139 @@
+import asyncio
+import re
+import redis
+from interactions import GuildNews, GuildText
+from database import AsyncRedisDB
+from utils import logutils
+
+logger = logutils.CustomLogger(__name__)
+
+class BlacklistChannelIndex:
+    """
+    Maps each guild to the channels blacklist entries are posted in.
+    Detected channels are kept in CHANNELS_KEY in db 2, next to sync_details, and in memory.
+    The channel index extension updates them from channel create/update/delete events, so
+    posting looks a guild up instead of scanning all of its channels. A channel set with
+    /set_blacklist_channel overrides detection for that guild.
+    """
+    CHANNELS_KEY = "blacklist_channels"
+    OVERRIDES_KEY = "blacklist_channel_overrides"
+    # "blacklist" or "blacklists" as a whole word, e.g. "blacklist", "🚫・blacklists", "blacklist-log",
+    # but not "blacklisted-chat".
+    CHANNEL_NAME_PATTERN = re.compile(r"(?:^|[^a-z])blacklists?(?:$|[^a-z])", re.IGNORECASE)
+
+    def __init__(self, db=2):
+        self.db = AsyncRedisDB(db=db)
+        self._channels = {}
+        self._overrides = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        """
+        Reads the persisted index into memory. Safe to call more than once.
+        """
+        async with self._load_lock:
+            if self._loaded:
+                return
+            channels = await self.db.redis.hgetall(self.CHANNELS_KEY)
+            overrides = await self.db.redis.hgetall(self.OVERRIDES_KEY)
+            self._channels = {
+                guild_id.decode('utf-8'): [channel_id for channel_id in channel_ids.decode('utf-8').split(",") if channel_id]
+                for guild_id, channel_ids in channels.items()
+            }
+            self._overrides = {guild_id.decode('utf-8'): channel_id.decode('utf-8') for guild_id, channel_id in overrides.items()}
+            self._loaded = True
+
+    @classmethod
+    def is_blacklist_channel(cls, channel):
+        return isinstance(channel, (GuildText, GuildNews)) and bool(cls.CHANNEL_NAME_PATTERN.search(channel.name))
+
+    def is_indexed(self, guild_id):
+        return str(guild_id) in self._channels
+
+    async def get_channels(self, guild):
+        """
+        Returns the guild's blacklist channels: its override if one is set, otherwise the
+        detected channels. Guilds that have never been indexed are indexed on first use.
+        """
+        await self.load()
+        guild_id = str(guild.id)
+        if guild_id in self._overrides:
+            channel_ids = [self._overrides[guild_id]]
+        elif guild_id in self._channels:
+            channel_ids = self._channels[guild_id]
+        else:
+            channel_ids = await self.rebuild(guild)
+        return [channel for channel in map(guild.get_channel, channel_ids) if channel is not None]
+
+    async def rebuild(self, guild):
+        """
+        Re-detects a guild's blacklist channels from its channel list.
+        """
+        await self.load()
+        channel_ids = [str(channel.id) for channel in guild.channels if self.is_blacklist_channel(channel)]
+        await self._store(str(guild.id), channel_ids)
+        return channel_ids
+
+    async def channel_changed(self, channel):
+        """
+        Adds or drops a created or renamed channel depending on its current name.
+        """
+        await self.load()
+        guild_id, channel_id = str(channel.guild.id), str(channel.id)
+        if guild_id not in self._channels:
+            await self.rebuild(channel.guild)
+            return
+        channel_ids = [indexed for indexed in self._channels[guild_id] if indexed != channel_id]
+        if self.is_blacklist_channel(channel):
+            channel_ids.append(channel_id)
+        if channel_ids != self._channels[guild_id]:
+            await self._store(guild_id, channel_ids)
+
+    async def channel_deleted(self, channel):
+        await self.load()
+        guild_id, channel_id = str(channel.guild.id), str(channel.id)
+        if channel_id in self._channels.get(guild_id, []):
+            await self._store(guild_id, [indexed for indexed in self._channels[guild_id] if indexed != channel_id])
+        if self._overrides.get(guild_id) == channel_id:
+            await self.clear_override(guild_id)
+
+    async def forget_guild(self, guild_id):
+        await self.load()
+        guild_id = str(guild_id)
+        self._channels.pop(guild_id, None)
+        self._overrides.pop(guild_id, None)
+        try:
+            await self.db.redis.hdel(self.CHANNELS_KEY, guild_id)
+            await self.db.redis.hdel(self.OVERRIDES_KEY, guild_id)
+        except redis.RedisError as e:
+            logger.error(f"Error removing blacklist channels for guild {guild_id}: {e}")
+
+    async def set_override(self, guild_id, channel_id):
+        await self.load()
+        self._overrides[str(guild_id)] = str(channel_id)
+        await self.db.redis.hset(self.OVERRIDES_KEY, str(guild_id), str(channel_id))
+
+    async def clear_override(self, guild_id):
+        await self.load()
+        self._overrides.pop(str(guild_id), None)
+        await self.db.redis.hdel(self.OVERRIDES_KEY, str(guild_id))
+
+    async def _store(self, guild_id, channel_ids):
+        self._channels[guild_id] = channel_ids
+        try:
+            await self.db.redis.hset(self.CHANNELS_KEY, guild_id, ",".join(channel_ids))
+        except redis.RedisError as e:
+            logger.error(f"Error storing blacklist channels for guild {guild_id}: {e}")
+
+
+_channel_index = None
+
+def get_channel_index():
+    """
+    Returns the process-wide BlacklistChannelIndex shared by all extensions.
+    """
+    global _channel_index
+    if _channel_index is None:
+        _channel_index = BlacklistChannelIndex()
+    return _channel_index
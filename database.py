@@ -1,117 +1,475 @@
-from functools import lru_cache, wraps
+from functools import wraps
 from utils import logutils
+from utils.pubsub import listen_forever
+from utils.ttlcache import TTLCache
+import asyncio
+import inspect
+import time
 import redis
+import redis.asyncio
 
 logger = logutils.CustomLogger(__name__)
 
-def cache_invalidation_on_user_change(func):
-    @wraps(func)
-    def wrapper(self, user_id, *args, **kwargs):
-        result = func(self, user_id, *args, **kwargs)
-        self.get_user.cache_clear()
-        return result
-    return wrapper
+def username_lex_member(user_id, username):
+    return f"{username.lower()}\x00{user_id}"
 
-class RedisDB:
-    def __init__(self, db=0):
-        self.redis = redis.StrictRedis(connection_pool=redis.ConnectionPool(host='localhost', port=6379, db=db))
+def username_trigrams(username):
+    """
+    Returns the set of lowercase 3-character substrings of a username.
+    """
+    username = username.lower()
+    return {username[i:i + 3] for i in range(len(username) - 2)}
+
+class AsyncRedisDB:
+    """
+    Non-blocking Redis store used by the bot's slash-command handlers.
+    Every method is a coroutine and must be awaited.
+    """
+    # User records are hashes under bl:user:<id>, indexed by the bl:users sorted set (scored by creation time).
+    USER_KEY = "bl:user:{}"
+    USERS_INDEX_KEY = "bl:users"
+    USERNAMES_KEY = "bl:usernames"
+    # Sorted set of "<lowercase username>\x00<user_id>" members, all scored 0, for ZRANGEBYLEX prefix lookups.
+    USERNAMES_LEX_KEY = "bl:usernames:lex"
+    # Set once rebuild_indexes has indexed every stored record; set_user alone never sets it.
+    INDEXED_KEY = "bl:indexed"
+    TRIGRAM_KEY = "bl:trigram:{}"
+    VERSION_KEY = "bl:version"
+    # user_id -> the version that last wrote or deleted it, so readers can fetch deltas.
+    CHANGELOG_KEY = "bl:changelog"
+    # SHA-256 of an uploaded proof image -> "<drive file id>:<thumbnail file id>".
+    PROOF_IMAGES_KEY = "bl:proof_images"
+    # Layout before schema 2: records keyed by the bare numeric user ID, plus an unordered ID set.
+    LEGACY_USER_KEY_PATTERN = "[0-9]*"
+    LEGACY_USER_IDS_KEY = "bl:ids"
+    SCHEMA_KEY = "bl:schema"
+    SCHEMA_VERSION = 2
+    # Per-guild sets (db 2) of the user IDs whose ban / blacklist embed has been applied.
+    GUILD_APPLIED_KEY = "applied_{}:{}"
+    # Pub/sub channel on which every process announces the user_ids it changed in a given db.
+    USER_CHANGES_CHANNEL = "user_changes:{}"
+    # Announced instead of a user_id after a bulk change such as a migration or index rebuild.
+    ALL_USERS_CHANGED = "*"
 
-    @cache_invalidation_on_user_change
-    def set_user(self, user_id, username, reason, proof_link, folder_id):
+    def __init__(self, db=0, cache_size=1024, cache_ttl=60):
+        self.db = db
+        self.redis = redis.asyncio.StrictRedis(connection_pool=redis.asyncio.ConnectionPool(host='localhost', port=6379, db=db))
+        self.user_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._invalidation_listener = None
+        self._migrated = False
+
+    async def start_cache_invalidation(self):
+        """
+        Subscribes to user change announcements from other processes so that their
+        writes evict the matching get_user cache entries here. Safe to call more than once.
+        """
+        if self._invalidation_listener is None:
+            self._invalidation_listener = asyncio.create_task(self._listen_for_user_changes())
+
+    async def _listen_for_user_changes(self):
+        def changed(user_id):
+            if user_id == self.ALL_USERS_CHANGED:
+                self.user_cache.clear()
+            else:
+                self.user_cache.invalidate(user_id)
+
+        # Anything announced while we were not subscribed is unknown, so every (re)subscription starts cold.
+        await listen_forever(self.redis, self.USER_CHANGES_CHANNEL.format(self.db), self.user_cache.clear, changed)
+
+    async def _user_changed(self, user_id):
+        if user_id == self.ALL_USERS_CHANGED:
+            self.user_cache.clear()
+        else:
+            self.user_cache.invalidate(user_id)
+        await self.redis.publish(self.USER_CHANGES_CHANNEL.format(self.db), user_id)
+
+    async def needs_migration(self):
+        """
+        Returns True until migrate_legacy_keys has completed, meaning a record may
+        still live under its bare user ID.
+        """
+        if not self._migrated:
+            self._migrated = await self.redis.get(self.SCHEMA_KEY) == str(self.SCHEMA_VERSION).encode('utf-8')
+        return not self._migrated
+
+    async def _get_username(self, user_id):
+        username = await self.redis.hget(self.USER_KEY.format(user_id), "username")
+        if username is None and await self.needs_migration():
+            username = await self.redis.hget(user_id, "username")
+        return username.decode('utf-8') if username is not None else None
+
+    async def set_user(self, user_id, username, reason, proof_link, folder_id):
         """
         Sets the user information in a hash with fields for username, reason, proof link, and folder ID.
+        Keeps the username search index and the creation-time index in step with the record.
         """
         try:
-            self.redis.hset(user_id, mapping={
-                "username": username,
-                "reason": reason,
-                "proof_link": proof_link,
-                "folder_id": folder_id
-            })
+            old_username = await self._get_username(user_id)
+            old_grams = username_trigrams(old_username) if old_username else set()
+            new_grams = username_trigrams(username)
+            legacy_layout = await self.needs_migration()
+
+            def queue(pipeline):
+                pipeline.hset(self.USER_KEY.format(user_id), mapping={
+                    "username": username,
+                    "reason": reason,
+                    "proof_link": proof_link,
+                    "folder_id": folder_id
+                })
+                if legacy_layout:
+                    pipeline.delete(user_id)
+                for gram in old_grams - new_grams:
+                    pipeline.srem(self.TRIGRAM_KEY.format(gram), user_id)
+                for gram in new_grams:
+                    pipeline.sadd(self.TRIGRAM_KEY.format(gram), user_id)
+                pipeline.hset(self.USERNAMES_KEY, user_id, username.lower())
+                if old_username:
+                    pipeline.zrem(self.USERNAMES_LEX_KEY, username_lex_member(user_id, old_username))
+                pipeline.zadd(self.USERNAMES_LEX_KEY, {username_lex_member(user_id, username): 0})
+                pipeline.zadd(self.USERS_INDEX_KEY, {user_id: time.time()}, nx=True)
+
+            await self._commit_versioned([user_id], queue)
+            await self._user_changed(user_id)
         except redis.RedisError as e:
             logger.error(f"Error setting user {user_id} in the database: {e}")
 
-    @lru_cache(maxsize=128)
-    def get_user(self, user_id):
+    async def _commit_versioned(self, user_ids, queue=None):
+        """
+        Runs the writes queued by queue(pipeline) in one MULTI/EXEC that also bumps VERSION_KEY
+        and stamps user_ids in CHANGELOG_KEY with the new version. VERSION_KEY is WATCHed so
+        concurrent writers never share a version; the transaction is retried if it moved.
+        Returns the new version.
+        """
+        async with self.redis.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    await pipeline.watch(self.VERSION_KEY)
+                    version = int(await pipeline.get(self.VERSION_KEY) or 0) + 1
+                    pipeline.multi()
+                    if queue:
+                        queue(pipeline)
+                    pipeline.set(self.VERSION_KEY, version)
+                    if user_ids:
+                        pipeline.zadd(self.CHANGELOG_KEY, {user_id: version for user_id in user_ids})
+                    await pipeline.execute()
+                    return version
+                except redis.WatchError:
+                    continue
+
+    async def get_changes_since(self, version):
+        """
+        Returns (current version, user_ids written or deleted after `version`), read atomically.
+        Used to bring a blacklist snapshot taken at `version` up to date.
+        """
+        async with self.redis.pipeline(transaction=True) as pipeline:
+            pipeline.get(self.VERSION_KEY)
+            pipeline.zrangebyscore(self.CHANGELOG_KEY, f"({int(version)}", "+inf")
+            current, user_ids = await pipeline.execute()
+        return int(current or 0), [user_id.decode('utf-8') for user_id in user_ids]
+
+    async def get_user(self, user_id):
         """
         Retrieves all fields for a given user_id as a dictionary.
+        Served from the per-instance TTL cache when possible.
+        """
+        return (await self.get_users([user_id])).get(user_id, {})
+
+    async def delete_user(self, user_id):
+        """
+        Deletes a user entry by user_id and drops it from the username search and creation-time indexes.
         """
         try:
-            user_data = self.redis.hgetall(user_id)
-            return {k.decode('utf-8'): v.decode('utf-8') for k, v in user_data.items()}
+            old_username = await self._get_username(user_id)
+
+            def queue(pipeline):
+                pipeline.delete(self.USER_KEY.format(user_id), user_id)
+                if old_username:
+                    for gram in username_trigrams(old_username):
+                        pipeline.srem(self.TRIGRAM_KEY.format(gram), user_id)
+                    pipeline.zrem(self.USERNAMES_LEX_KEY, username_lex_member(user_id, old_username))
+                pipeline.hdel(self.USERNAMES_KEY, user_id)
+                pipeline.zrem(self.USERS_INDEX_KEY, user_id)
+
+            await self._commit_versioned([user_id], queue)
+            await self._user_changed(user_id)
         except redis.RedisError as e:
-            logger.error(f"Error getting user {user_id} from the database: {e}")
-            return {}
+            logger.error(f"Error deleting user {user_id} from the database: {e}")
 
-    @cache_invalidation_on_user_change
-    def delete_user(self, user_id):
+    async def get_blacklist_version(self):
         """
-        Deletes a user entry by user_id.
+        Returns the blacklist version as a string. It is bumped atomically with
+        every set_user/delete_user, so it changes exactly when the data does.
+        CHANGELOG_KEY records which user_ids each version touched.
         """
         try:
-            self.redis.delete(user_id)
+            version = await self.redis.get(self.VERSION_KEY)
+            return version.decode('utf-8') if version is not None else "0"
         except redis.RedisError as e:
-            logger.error(f"Error deleting user {user_id} from the database: {e}")
+            logger.error(f"Error getting the blacklist version from the database: {e}")
+            return None
 
-    def list_all_users(self):
+    async def list_all_users(self):
         """
-        Lists all user_ids in the database.
+        Lists all user_ids in the database, oldest first.
         """
         try:
-            return [key.decode('utf-8') for key in self.redis.scan_iter("*")]
+            return [user_id.decode('utf-8') for user_id in await self.redis.zrange(self.USERS_INDEX_KEY, 0, -1)]
         except redis.RedisError as e:
             logger.error(f"Error listing all users from the database: {e}")
             return []
 
-    def list_all_users_info(self):
+    async def list_user_ids(self):
+        """
+        Returns the set of blacklisted user_ids.
+        """
+        return set(await self.list_all_users())
+
+    async def count_users(self):
+        """
+        Returns the number of blacklisted users.
+        """
+        try:
+            return await self.redis.zcard(self.USERS_INDEX_KEY)
+        except redis.RedisError as e:
+            logger.error(f"Error counting users in the database: {e}")
+            return 0
+
+    async def get_user_ids_page(self, offset, limit):
+        """
+        Returns up to limit user_ids starting at offset, oldest first.
+        """
+        try:
+            return [user_id.decode('utf-8') for user_id in await self.redis.zrange(self.USERS_INDEX_KEY, offset, offset + limit - 1)]
+        except redis.RedisError as e:
+            logger.error(f"Error paging user ids from the database: {e}")
+            return []
+
+    async def get_users(self, user_ids):
+        """
+        Retrieves the records for the given user_ids, taking cached ones from the
+        TTL cache and the rest in one pipeline.
+        Returns a dict of user_id to record in the order given, skipping ids with no record.
+        """
+        user_ids = list(user_ids)
+        cached = {user_id: self.user_cache.get(user_id) for user_id in user_ids}
+        misses = [user_id for user_id, user_data in cached.items() if user_data is None]
+        try:
+            generation = self.user_cache.generation
+            async with self.redis.pipeline() as pipeline:
+                for user_id in misses:
+                    pipeline.hgetall(self.USER_KEY.format(user_id))
+                results = await pipeline.execute() if misses else []
+            legacy_misses = [i for i, user_data in enumerate(results) if not user_data]
+            if legacy_misses and await self.needs_migration():
+                async with self.redis.pipeline() as pipeline:
+                    for i in legacy_misses:
+                        pipeline.hgetall(misses[i])
+                    for i, user_data in zip(legacy_misses, await pipeline.execute()):
+                        results[i] = user_data
+            for user_id, user_data in zip(misses, results):
+                cached[user_id] = {k.decode('utf-8'): v.decode('utf-8') for k, v in user_data.items()}
+                self.user_cache.set(user_id, cached[user_id], generation)
+        except redis.RedisError as e:
+            logger.error(f"Error getting users from the database: {e}")
+        return {user_id: dict(user_data) for user_id, user_data in cached.items() if user_data}
+
+    async def iter_users_info(self, user_ids=None, page_size=500):
+        """
+        Yields (user_id, record) pairs one page at a time, so memory stays bounded by page_size.
+        Without user_ids the creation-time index is walked with ZSCAN cursor pages;
+        with them, the given ids are fetched in page_size chunks.
+        """
+        try:
+            if user_ids is not None:
+                user_ids = list(user_ids)
+                for i in range(0, len(user_ids), page_size):
+                    for user_id, user_data in (await self.get_users(user_ids[i:i + page_size])).items():
+                        yield user_id, user_data
+                return
+            cursor = 0
+            while True:
+                cursor, members = await self.redis.zscan(self.USERS_INDEX_KEY, cursor, count=page_size)
+                for user_id, user_data in (await self.get_users(member.decode('utf-8') for member, _ in members)).items():
+                    yield user_id, user_data
+                if cursor == 0:
+                    break
+        except redis.RedisError as e:
+            logger.error(f"Error streaming users from the database: {e}")
+
+    async def list_all_users_info(self):
         """
         Lists all users and their associated information from the database.
+        Prefer iter_users_info for large blacklists.
         """
-        users = self.list_all_users()
-        all_user_data = {}
+        return {user_id: user_data async for user_id, user_data in self.iter_users_info()}
+
+    async def search_user_ids(self, pattern):
+        """
+        Returns the sorted user_ids whose username contains pattern, case-insensitively.
+        Patterns of three or more characters are answered from the trigram index;
+        shorter ones fall back to scanning the single username hash.
+        """
+        needle = pattern.lower()
         try:
-            with self.redis.pipeline() as pipeline:
-                for user_id in users:
-                    pipeline.hgetall(user_id)
-                results = pipeline.execute()
-                
-                for user_id, user_data in zip(users, results):
-                    all_user_data[user_id] = {k.decode('utf-8'): v.decode('utf-8') for k, v in user_data.items()}
+            grams = username_trigrams(needle)
+            if grams:
+                candidates = [c.decode('utf-8') for c in await self.redis.sinter([self.TRIGRAM_KEY.format(g) for g in grams])]
+                usernames = await self.redis.hmget(self.USERNAMES_KEY, candidates) if candidates else []
+                user_ids = [user_id for user_id, username in zip(candidates, usernames) if username and needle in username.decode('utf-8')]
+            else:
+                user_ids = [user_id.decode('utf-8') async for user_id, username in self.redis.hscan_iter(self.USERNAMES_KEY) if needle in username.decode('utf-8')]
+            return sorted(user_ids)
         except redis.RedisError as e:
-            logger.error(f"Error listing all users and their information from the database: {e}")
-        return all_user_data
+            logger.error(f"Error searching for users in the database: {e}")
+            return []
+
+    async def autocomplete_usernames(self, prefix, limit=25):
+        """
+        Returns up to `limit` (user_id, lowercase username) pairs whose username starts
+        with prefix, in username order, with one ZRANGEBYLEX on USERNAMES_LEX_KEY.
+        """
+        start = prefix.lower().encode('utf-8')
+        try:
+            # 0xff never occurs in UTF-8, so it sorts after every member sharing the prefix.
+            members = await self.redis.zrangebylex(self.USERNAMES_LEX_KEY, b"[" + start, b"[" + start + b"\xff", start=0, num=limit)
+        except redis.RedisError as e:
+            logger.error(f"Error autocompleting usernames in the database: {e}")
+            return []
+        pairs = []
+        for member in members:
+            username, _, user_id = member.decode('utf-8').rpartition("\x00")
+            pairs.append((user_id, username))
+        return pairs
 
-    def search_users(self, pattern):
+    async def needs_index_rebuild(self):
+        """
+        Returns True if there are user records that rebuild_indexes has never indexed,
+        e.g. data written before the search indexes existed.
+        """
+        try:
+            return not await self.redis.exists(self.INDEXED_KEY) and await self.count_users() > 0
+        except redis.RedisError as e:
+            logger.error(f"Error checking the username index: {e}")
+            return False
+
+    async def search_users(self, pattern):
         """
         Searches for users by matching a pattern in the username field.
         """
-        matched_data = []
+        return list((await self.get_users(await self.search_user_ids(pattern))).items())
+
+    async def rebuild_indexes(self, batch_size=500):
+        """
+        Drops and rebuilds the username search index from the stored user records, and
+        reconciles the creation-time index with them (existing creation times are kept).
+        Returns the number of users indexed.
+        """
+        indexed = 0
         try:
-            users = self.list_all_users()
-            for user_id in users:
-                username = self.redis.hget(user_id, "username").decode('utf-8')
-                if pattern.lower() in username.lower():
-                    user_data = self.get_user(user_id)
-                    matched_data.append((user_id, user_data))
+            stale_keys = [key async for key in self.redis.scan_iter(self.TRIGRAM_KEY.format("*"))]
+            for i in range(0, len(stale_keys), batch_size):
+                await self.redis.delete(*stale_keys[i:i + batch_size])
+            await self.redis.delete(self.USERNAMES_KEY, self.USERNAMES_LEX_KEY)
+
+            prefix = self.USER_KEY.format("")
+            users = [key.decode('utf-8')[len(prefix):] async for key in self.redis.scan_iter(self.USER_KEY.format("*"))]
+            for i in range(0, len(users), batch_size):
+                indexed += await self._index_users(users[i:i + batch_size])
+
+            orphans = set(await self.list_all_users()) - set(users)
+            if orphans:
+                await self.redis.zrem(self.USERS_INDEX_KEY, *orphans)
+                await self._commit_versioned(list(orphans))
+            for i in range(0, len(users), batch_size):
+                await self._commit_versioned(users[i:i + batch_size])
+            await self.redis.set(self.INDEXED_KEY, 1)
+            await self._user_changed(self.ALL_USERS_CHANGED)
         except redis.RedisError as e:
-            logger.error(f"Error searching for users in the database: {e}")
-        return matched_data
-    
-    def record_sync_details(self, guild_id, channel_id, count):
+            logger.error(f"Error rebuilding the blacklist indexes: {e}")
+        return indexed
+
+    async def _index_users(self, user_ids):
+        """
+        Adds the records stored under USER_KEY for user_ids to the username search indexes
+        and the creation-time index. Returns the number of records indexed.
+        """
+        async with self.redis.pipeline() as pipeline:
+            for user_id in user_ids:
+                pipeline.hget(self.USER_KEY.format(user_id), "username")
+            usernames = await pipeline.execute()
+        indexed = 0
+        async with self.redis.pipeline() as pipeline:
+            for user_id, username in zip(user_ids, usernames):
+                if not username:
+                    continue
+                username = username.decode('utf-8')
+                for gram in username_trigrams(username):
+                    pipeline.sadd(self.TRIGRAM_KEY.format(gram), user_id)
+                pipeline.hset(self.USERNAMES_KEY, user_id, username.lower())
+                pipeline.zadd(self.USERNAMES_LEX_KEY, {username_lex_member(user_id, username): 0})
+                pipeline.zadd(self.USERS_INDEX_KEY, {user_id: time.time()}, nx=True)
+                indexed += 1
+            await pipeline.execute()
+        return indexed
+
+    async def migrate_legacy_keys(self, batch_size=500):
+        """
+        Moves records stored under bare user-ID keys to USER_KEY and adds them to the
+        creation-time and username search indexes. Safe to run while the bot is serving: each batch is indexed
+        before it is renamed, readers fall back to the legacy key until SCHEMA_KEY is set,
+        and RENAMENX never overwrites a record already written under the new layout.
+        Returns the number of records moved.
+        """
+        migrated = 0
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = await self.redis.scan(cursor, match=self.LEGACY_USER_KEY_PATTERN, count=batch_size)
+                async with self.redis.pipeline() as pipeline:
+                    for key in keys:
+                        pipeline.type(key)
+                    key_types = await pipeline.execute() if keys else []
+                user_ids = [key.decode('utf-8') for key, key_type in zip(keys, key_types) if key_type == b"hash"]
+                if user_ids:
+                    migrated_at = time.time()
+                    await self.redis.zadd(self.USERS_INDEX_KEY, {user_id: migrated_at for user_id in user_ids}, nx=True)
+                    async with self.redis.pipeline() as pipeline:
+                        for user_id in user_ids:
+                            pipeline.renamenx(user_id, self.USER_KEY.format(user_id))
+                        results = await pipeline.execute(raise_on_error=False)
+                    for user_id, renamed in zip(user_ids, results):
+                        if renamed is True or renamed == 1:
+                            migrated += 1
+                        elif renamed is False or renamed == 0:
+                            # A newer record was already written under the new layout.
+                            await self.redis.delete(user_id)
+                    await self._index_users(user_ids)
+                    await self._commit_versioned(user_ids)
+                if cursor == 0:
+                    break
+            await self.redis.delete(self.LEGACY_USER_IDS_KEY)
+            await self.redis.set(self.SCHEMA_KEY, self.SCHEMA_VERSION)
+            self._migrated = True
+            await self._user_changed(self.ALL_USERS_CHANGED)
+        except redis.RedisError as e:
+            logger.error(f"Error migrating legacy user keys: {e}")
+        return migrated
+
+    async def record_sync_details(self, guild_id, channel_id, count):
         """
         Records details of a sync operation to a guild channel.
         """
         try:
-            self.redis.hset(f"sync_details:{guild_id}", mapping={
+            await self.redis.hset(f"sync_details:{guild_id}", mapping={
                 "channel_id": channel_id,
                 "count": count
             })
         except redis.RedisError as e:
             logger.error(f"Error recording sync details for guild {guild_id} in the database: {e}")
             
-    def get_sync_details(self, guild_id):
+    async def get_sync_details(self, guild_id):
         try:
-            details = self.redis.hgetall(f"sync_details:{guild_id}")
+            details = await self.redis.hgetall(f"sync_details:{guild_id}")
             if details:
                 return {k.decode('utf-8'): v.decode('utf-8') for k, v in details.items()}
             return {}
@@ -119,21 +477,21 @@ class RedisDB:
             logger.error(f"Error getting sync details for guild {guild_id} from the database: {e}")
             return {}
     
-    def set_last_sync_details(self, guild_id, sync_hash):
+    async def set_last_sync_details(self, guild_id, sync_hash):
         """
         Records the last sync hash for a guild.
         """
         try:
-            self.redis.hset("last_sync_hash", guild_id, sync_hash)
+            await self.redis.hset("last_sync_hash", guild_id, sync_hash)
         except redis.RedisError as e:
             logger.error(f"Error setting last sync hash for guild {guild_id}: {e}")
 
-    def get_last_sync_hash(self, guild_id):
+    async def get_last_sync_hash(self, guild_id):
         """
         Retrieves the last sync hash for a guild.
         """
         try:
-            hash_bytes = self.redis.hget("last_sync_hash", guild_id)
+            hash_bytes = await self.redis.hget("last_sync_hash", guild_id)
             if hash_bytes is not None:
                 return hash_bytes.decode('utf-8')
             return None
@@ -141,56 +499,181 @@ class RedisDB:
             logger.error(f"Error getting last sync hash for guild {guild_id}: {e}")
             return None
         
-    def list_all_sync_hashes(self):
+    async def list_all_sync_hashes(self):
         """
         Lists all guilds and their last sync hashes.
         """
         try:
-            return {k.decode('utf-8'): v.decode('utf-8') for k, v in self.redis.hgetall("last_sync_hash").items()}
+            return {k.decode('utf-8'): v.decode('utf-8') for k, v in (await self.redis.hgetall("last_sync_hash")).items()}
         except redis.RedisError as e:
             logger.error(f"Error listing all sync hashes from the database: {e}")
             return {}
         
-    def list_all_sync_details(self):
+    async def list_all_sync_details(self):
         """
         Lists all guilds and their sync details.
         """
         try:
-            return {k.decode('utf-8'): {k.decode('utf-8'): v.decode('utf-8') for k, v in v.items()} for k, v in self.redis.hgetall("sync_details").items()}
+            return {k.decode('utf-8'): {k.decode('utf-8'): v.decode('utf-8') for k, v in v.items()} for k, v in (await self.redis.hgetall("sync_details")).items()}
         except redis.RedisError as e:
             logger.error(f"Error listing all sync details from the database: {e}")
             return {}
         
-    def check_if_guild_synced(self, guild_id, current_sync_hash):
+    async def filter_members(self, key, members, batch_size=1000):
+        """
+        Returns the subset of members that belong to the set at key,
+        checked with one SMISMEMBER per batch instead of one SISMEMBER each.
+        """
+        members = [str(member) for member in members]
+        found = set()
+        try:
+            for i in range(0, len(members), batch_size):
+                batch = members[i:i + batch_size]
+                flags = await self.redis.smismember(key, batch)
+                found.update(member for member, flag in zip(batch, flags) if flag)
+        except redis.RedisError as e:
+            logger.error(f"Error checking members of {key} in the database: {e}")
+        return found
+
+    async def get_guild_applied(self, guild_id, kind="bans"):
+        """
+        Returns the set of user_ids already applied to a guild.
+        kind is "bans" for issued bans or "posts" for blacklist embeds sent to its channel.
+        """
+        try:
+            return {user_id.decode('utf-8') for user_id in await self.redis.smembers(self.GUILD_APPLIED_KEY.format(kind, guild_id))}
+        except redis.RedisError as e:
+            logger.error(f"Error getting applied {kind} for guild {guild_id}: {e}")
+            return set()
+
+    async def is_guild_applied(self, guild_id, user_id, kind="bans"):
+        """
+        Returns True if user_id is marked as applied to a guild.
+        """
+        try:
+            return bool(await self.redis.sismember(self.GUILD_APPLIED_KEY.format(kind, guild_id), str(user_id)))
+        except redis.RedisError as e:
+            logger.error(f"Error checking applied {kind} for guild {guild_id}: {e}")
+            return False
+
+    async def add_guild_applied(self, guild_id, user_ids, kind="bans"):
+        """
+        Marks user_ids as applied to a guild.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return
+        try:
+            await self.redis.sadd(self.GUILD_APPLIED_KEY.format(kind, guild_id), *user_ids)
+        except redis.RedisError as e:
+            logger.error(f"Error adding applied {kind} for guild {guild_id}: {e}")
+
+    async def remove_guild_applied(self, guild_id, user_ids, kind="bans"):
+        """
+        Clears the applied mark for user_ids in a guild.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return
+        try:
+            await self.redis.srem(self.GUILD_APPLIED_KEY.format(kind, guild_id), *user_ids)
+        except redis.RedisError as e:
+            logger.error(f"Error removing applied {kind} for guild {guild_id}: {e}")
+
+    async def check_if_guild_synced(self, guild_id, current_sync_hash):
         """
         Checks if a guild has already been synced with the current sync hash.
         """
         # Check if guild_id is in the database as an entry (sync_details:guild_id)
-        if not self.redis.exists(f"sync_details:{guild_id}"):
+        if not await self.redis.exists(f"sync_details:{guild_id}"):
             return False
-        last_sync_hash = self.get_last_sync_hash(guild_id)
+        last_sync_hash = await self.get_last_sync_hash(guild_id)
         return last_sync_hash == current_sync_hash
 
-    def exists(self, user_id):
+    async def exists(self, user_id):
         """
         Checks if a user entry exists in the database.
         """
         try:
-            return self.redis.exists(user_id)
+            if await self.redis.exists(self.USER_KEY.format(user_id)):
+                return True
+            return await self.needs_migration() and bool(await self.redis.exists(user_id))
         except redis.RedisError as e:
             logger.error(f"Error checking if user {user_id} exists in the database: {e}")
             return False
 
-    def flush_db(self):
+    async def get_proof_image(self, digest):
+        """
+        Returns the (file_id, thumbnail_id, extension) of a proof image already uploaded to
+        Drive, looked up by the SHA-256 of its original bytes, or None if it is new.
+        extension is empty for images recorded before it was stored.
+        """
+        try:
+            entry = await self.redis.hget(self.PROOF_IMAGES_KEY, digest)
+            if entry is None:
+                return None
+            file_id, thumbnail_id, extension = (entry.decode('utf-8').split(":") + [""])[:3]
+            return file_id, thumbnail_id, extension
+        except redis.RedisError as e:
+            logger.error(f"Error getting proof image {digest}: {e}")
+            return None
+
+    async def set_proof_image(self, digest, file_id, thumbnail_id, extension):
+        """
+        Records the Drive files a proof image was uploaded as, and the extension of the stored image.
+        """
+        try:
+            await self.redis.hset(self.PROOF_IMAGES_KEY, digest, f"{file_id}:{thumbnail_id}:{extension}")
+        except redis.RedisError as e:
+            logger.error(f"Error recording proof image {digest}: {e}")
+
+    async def remove_proof_image(self, digest):
+        try:
+            await self.redis.hdel(self.PROOF_IMAGES_KEY, digest)
+        except redis.RedisError as e:
+            logger.error(f"Error removing proof image {digest}: {e}")
+
+    async def flush_db(self):
         """
         Clears the entire database, removing all keys and data.
         """
         try:
-            self.redis.flushdb()
+            await self.redis.flushdb()
         except redis.RedisError as e:
             logger.error(f"Error flushing the database: {e}")
 
 
+class RedisDB:
+    """
+    Blocking shim around AsyncRedisDB for scripts and the REPL.
+    Exposes the same methods, each run to completion on a private event loop;
+    async generators become plain generators.
+    """
+    def __init__(self, db=0):
+        self._loop = asyncio.new_event_loop()
+        self._db = AsyncRedisDB(db=db)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if inspect.isasyncgenfunction(attr):
+            @wraps(attr)
+            def generator(*args, **kwargs):
+                agen = attr(*args, **kwargs)
+                while True:
+                    try:
+                        yield self._loop.run_until_complete(agen.__anext__())
+                    except StopAsyncIteration:
+                        return
+            return generator
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @wraps(attr)
+        def wrapper(*args, **kwargs):
+            return self._loop.run_until_complete(attr(*args, **kwargs))
+        return wrapper
+
+
 # db_0 = RedisDB(db=0)
 # db_1 = RedisDB(db=1)
 # db_2 = RedisDB(db=69)
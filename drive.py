@@ -2,7 +2,12 @@
 
 CREDENTIALS = 'credentials/credentials.json'
 
+import asyncio
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 import google_auth_oauthlib
 from googleapiclient.errors import HttpError
 from googleapiclient.discovery import build
@@ -14,14 +19,38 @@ import pickle
 from googleapiclient.http import MediaIoBaseDownload
 
 class Drive:
+    # Drive accepts at most 100 calls in one batch request.
+    BATCH_SIZE = 100
+    LIST_PAGE_SIZE = 1000
+    LIST_FIELDS = 'id, name, mimeType, modifiedTime, size, parents, shortcutDetails'
+    SHORTCUT_MIME_TYPE = 'application/vnd.google-apps.shortcut'
+    # How long cached folder listings are served before polling the Changes API again.
+    CHANGES_POLL_INTERVAL = 30
+
     def __init__(self):
         self.SCOPES = ['https://www.googleapis.com/auth/drive']
         self.creds = self._load_credentials()
-        if self.creds:
-            self.service = build('drive', 'v3', credentials=self.creds)
-        else:
+        if not self.creds:
             print('Failed to initialize Drive service.')
             sys.exit(1)
+        self._local = threading.local()
+        self._listings = {}
+        self._file_parents = {}
+        self._listings_lock = threading.RLock()
+        self._changes_token = None
+        self._changes_polled_at = 0
+        self._root_id = None
+
+    @property
+    def service(self):
+        """
+        The Drive v3 service for the calling thread. googleapiclient's httplib2 transport
+        is not thread-safe, so each thread gets its own service and authorized connection.
+        """
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = build('drive', 'v3', credentials=self.creds)
+        return service
         
     def _load_credentials(self):
         creds = None
@@ -83,11 +112,8 @@ class Drive:
             file_id = file.get('id')
             if not file_id:
                 raise Exception(f"Failed to upload file {file_name}")
-            permission = {
-                'type': 'anyone',
-                'role': 'reader'
-            }
-            self.service.permissions().create(fileId=file_id, body=permission).execute()
+            self.invalidate_listing(folder_id)
+            # Readable by anyone through the permission inherited from its folder.
             return file_id
         except HttpError as httpexc:
             print(f'An error occurred: {httpexc}')
@@ -107,16 +133,40 @@ class Drive:
             folder_id = file.get('id')
             if not folder_id:
                 raise Exception(f"Failed to create folder '{folder_name}'")
-            permission = {
-                'type': 'anyone',
-                'role': 'reader'
-            }
-            self.service.permissions().create(fileId=folder_id, body=permission).execute()
+            self.share_with_anyone(folder_id)
             print(f"Folder '{folder_name}' created with ID: {folder_id}")
             return folder_id
         except HttpError as e:
             raise Exception(f"Error creating folder '{folder_name}': {e}")
     
+    def _execute_batch(self, requests):
+        """
+        Sends (request_id, HttpRequest) pairs through Drive's batch endpoint, BATCH_SIZE
+        requests per HTTP call. Returns {request_id: exception} for the requests that failed.
+        """
+        errors = {}
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+
+        for i in range(0, len(requests), self.BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for request_id, request in requests[i:i + self.BATCH_SIZE]:
+                batch.add(request, request_id=request_id)
+            batch.execute()
+        return errors
+
+    def share_with_anyone(self, file_id):
+        """
+        Grants 'anyone' the 'reader' role on a file or folder.
+        """
+        permission = {
+            'type': 'anyone',
+            'role': 'reader'
+        }
+        self.service.permissions().create(fileId=file_id, body=permission).execute()
+
     def clean_user_id(self, user_id):
         cleaned_user_id = user_id.strip("`")
         return str(cleaned_user_id)
@@ -124,18 +174,120 @@ class Drive:
     def list_files(self, folder_id, images_only: bool = False):
         """
         Lists files in the given folder ID.
-        If images_only is True, only files with MIME type containing 'image/' are returned.
+        If images_only is True, only files with MIME type containing 'image/', and shortcuts
+        to such files, are returned.
         Returns a list of dictionaries containing file metadata.
+
+        Listings are fetched in full, page by page, and cached per folder. The cache is
+        kept current from the Drive Changes API, polled at most every CHANGES_POLL_INTERVAL
+        seconds, so repeated lookups of a folder are answered locally.
         """
         try:
             folder_id = self.clean_user_id(folder_id)
-            query = f"'{folder_id}' in parents"
-            if images_only:
-                query += " and mimeType contains 'image/'"
-            results = self.service.files().list(q=query, fields='files(id, name, mimeType, modifiedTime, size)').execute()
-            return results.get('files', [])
+            if folder_id == 'root':
+                folder_id = self._get_root_id()
+            self._poll_changes()
+            with self._listings_lock:
+                files = self._listings.get(folder_id)
+            if files is None:
+                files = self._fetch_listing(folder_id)
+            return [dict(file) for file in files if not images_only or self.is_image(file)]
         except HttpError as e:
             raise Exception(f"Error listing files in folder '{folder_id}': {e}")
+
+    def is_image(self, file):
+        mime_type = file.get('shortcutDetails', {}).get('targetMimeType', file['mimeType'])
+        return 'image/' in mime_type
+
+    def content_id(self, file):
+        """
+        Returns the ID to download a listed file's content from: the target of a shortcut,
+        otherwise the file itself.
+        """
+        return file.get('shortcutDetails', {}).get('targetId', file['id'])
+
+    def create_shortcut(self, target_id, folder_id, name):
+        """
+        Adds a shortcut to an existing file in folder_id and returns the shortcut's ID.
+        """
+        file_metadata = {
+            'name': name,
+            'mimeType': self.SHORTCUT_MIME_TYPE,
+            'parents': [folder_id],
+            'shortcutDetails': {'targetId': target_id},
+        }
+        shortcut = self.service.files().create(body=file_metadata, fields='id').execute()
+        self.invalidate_listing(folder_id)
+        return shortcut['id']
+
+    def invalidate_listing(self, folder_id):
+        """
+        Drops a folder's cached listing, e.g. after adding a file to it.
+        """
+        with self._listings_lock:
+            for file in self._listings.pop(folder_id, []):
+                self._file_parents.get(file['id'], set()).discard(folder_id)
+
+    def _get_root_id(self):
+        # Changes name a file's parents by ID, never by the 'root' alias.
+        if self._root_id is None:
+            self._root_id = self.service.files().get(fileId='root', fields='id').execute()['id']
+        return self._root_id
+
+    def _fetch_listing(self, folder_id):
+        files = []
+        page_token = None
+        while True:
+            results = self.service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                pageSize=self.LIST_PAGE_SIZE,
+                pageToken=page_token,
+                fields=f'nextPageToken, files({self.LIST_FIELDS})',
+            ).execute()
+            files += results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        with self._listings_lock:
+            self.invalidate_listing(folder_id)
+            self._listings[folder_id] = files
+            for file in files:
+                self._file_parents.setdefault(file['id'], set()).add(folder_id)
+        return files
+
+    def _poll_changes(self):
+        with self._listings_lock:
+            if time.monotonic() - self._changes_polled_at < self.CHANGES_POLL_INTERVAL:
+                return
+            self._changes_polled_at = time.monotonic()
+            if self._changes_token is None:
+                # Taken before anything is cached, so no later change can be missed.
+                self._changes_token = self.service.changes().getStartPageToken().execute()['startPageToken']
+                return
+            page_token = self._changes_token
+            while page_token:
+                results = self.service.changes().list(
+                    pageToken=page_token,
+                    pageSize=self.LIST_PAGE_SIZE,
+                    fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({self.LIST_FIELDS}, trashed))',
+                ).execute()
+                for change in results.get('changes', []):
+                    self._apply_change(change)
+                page_token = results.get('nextPageToken')
+                self._changes_token = results.get('newStartPageToken', self._changes_token)
+
+    def _apply_change(self, change):
+        file_id = change['fileId']
+        for folder_id in self._file_parents.pop(file_id, set()):
+            self._listings[folder_id] = [file for file in self._listings[folder_id] if file['id'] != file_id]
+        file = change.get('file')
+        if change.get('removed') or not file or file.get('trashed'):
+            return
+        file = {key: value for key, value in file.items() if key != 'trashed'}
+        for folder_id in file.get('parents', []):
+            if folder_id in self._listings:
+                self._listings[folder_id].append(file)
+                self._file_parents.setdefault(file_id, set()).add(folder_id)
     
     def download_file(self, file_id, file_path):
         """
@@ -147,8 +299,7 @@ class Drive:
                 downloader = MediaIoBaseDownload(fh, request)
                 done = False
                 while not done:
-                    status, done = downloader.next_chunk()
-                    print(f'Download progress: {int(status.progress() * 100)}%')
+                    _, done = downloader.next_chunk()
         except HttpError as e:
             if e.resp.status == 404:
                 raise FileNotFoundError(f"File with ID '{file_id}' not found.")
@@ -190,13 +341,19 @@ class Drive:
     
     def update_folder_names(self):
         items = self.list_files('root')
-        for item in items:
-            if item['mimeType'] == 'application/vnd.google-apps.folder' and item['name'] != "Weirdos":
-                new_name = f"blacklist-{item['name']}"
-                file_metadata = {'name': new_name}
-                self.service.files().update(fileId=item['id'], body=file_metadata).execute()
-                print(f'Folder ID: {item["id"]} updated to {new_name}')
-                
+        renames = {
+            item['id']: f"blacklist-{item['name']}"
+            for item in items
+            if item['mimeType'] == 'application/vnd.google-apps.folder' and item['name'] != "Weirdos"
+        }
+        errors = self._execute_batch([
+            (folder_id, self.service.files().update(fileId=folder_id, body={'name': new_name}, fields='id'))
+            for folder_id, new_name in renames.items()
+        ])
+        for folder_id, error in errors.items():
+            print(f'Folder ID: {folder_id} could not be renamed: {error}')
+        print(f'{len(renames) - len(errors)}/{len(renames)} folders renamed')
+
     def retrieve_folder_ids(self):
         folders_list = []
         items = self.list_files('root')
@@ -211,14 +368,110 @@ class Drive:
         
     def set_all_folders_to_everyone(self):
         items = self.list_files('root')
-        for item in items:
-            if item['mimeType'] == 'application/vnd.google-apps.folder':
-                permission = {
-                    'type': 'anyone',
-                    'role': 'reader'
-                }
-                self.service.permissions().create(fileId=item['id'], body=permission).execute()
-                print(f'Folder ID: {item["id"]} set to everyone')
+        folder_ids = [item['id'] for item in items if item['mimeType'] == 'application/vnd.google-apps.folder']
+        permission = {
+            'type': 'anyone',
+            'role': 'reader'
+        }
+        errors = self._execute_batch([
+            (folder_id, self.service.permissions().create(fileId=folder_id, body=permission, fields='id'))
+            for folder_id in folder_ids
+        ])
+        for folder_id, error in errors.items():
+            print(f'Folder ID: {folder_id} could not be shared: {error}')
+        print(f'{len(folder_ids) - len(errors)}/{len(folder_ids)} folders set to everyone')
+
+
+class _BytesReader:
+    """
+    Serves bytes through the readexactly interface of an aiohttp StreamReader.
+    """
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    async def readexactly(self, n):
+        chunk = self._data[self._offset:self._offset + n]
+        self._offset += n
+        return bytes(chunk)
+
+
+class AsyncDrive:
+    """
+    Awaitable facade over Drive for use on the event loop.
+    Exposes the same methods as coroutines, each run on a private thread pool whose
+    threads keep their own Drive service; link helpers that make no request stay plain.
+    """
+    LOCAL_METHODS = {'clean_user_id', 'get_file_link', 'get_folder_link', 'invalidate_listing', 'is_image', 'content_id'}
+    UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable&fields=id'
+    # Chunks of a resumable upload must be multiples of 256 KiB, except the last.
+    UPLOAD_CHUNK_SIZE = 16 * 256 * 1024
+
+    def __init__(self, drive=None, max_workers=8):
+        self.drive = drive or Drive()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='drive')
+
+    async def _authorization(self):
+        creds = self.drive.creds
+        if not creds.valid:
+            await asyncio.get_running_loop().run_in_executor(self._executor, creds.refresh, Request())
+        return {'Authorization': f'Bearer {creds.token}'}
+
+    async def upload_stream(self, session, content, size, file_name, folder_id, mime_type):
+        """
+        Uploads `size` bytes read from `content` (an aiohttp StreamReader, such as a
+        download's resp.content) as a new file in folder_id and returns its ID.
+        The body goes through a Drive resumable upload session one chunk at a time,
+        so it is never written to disk or held in memory in full.
+        """
+        headers = await self._authorization()
+        async with session.post(
+            self.UPLOAD_URL,
+            json={'name': file_name, 'parents': [folder_id]},
+            headers={**headers, 'X-Upload-Content-Type': mime_type, 'X-Upload-Content-Length': str(size)},
+        ) as resp:
+            resp.raise_for_status()
+            upload_url = resp.headers['Location']
+
+        # `pending` holds the bytes from `offset` on that Drive has not stored yet.
+        offset, pending = 0, b""
+        while True:
+            want = min(self.UPLOAD_CHUNK_SIZE, size - offset)
+            if len(pending) < want:
+                pending += await content.readexactly(want - len(pending))
+            content_range = f'bytes {offset}-{offset + want - 1}/{size}' if want else f'bytes */{size}'
+            # Drive answers 308 for every chunk but the last; it is not a redirect.
+            async with session.put(upload_url, data=pending, headers={'Content-Range': content_range}, allow_redirects=False) as resp:
+                if resp.status == 308:
+                    # Drive may store less than it was sent. Range ("bytes=0-<last stored byte>")
+                    # says where to resume; without it nothing has been stored yet.
+                    stored = resp.headers.get('Range')
+                    stored_to = int(stored.rsplit('-', 1)[1]) + 1 if stored else 0
+                    if stored_to < offset:
+                        raise IOError(f"Drive lost part of the upload of {file_name}")
+                    pending = pending[stored_to - offset:]
+                    offset = stored_to
+                    continue
+                resp.raise_for_status()
+                self.drive.invalidate_listing(folder_id)
+                return (await resp.json())['id']
+
+    async def upload_bytes(self, session, data, file_name, folder_id, mime_type):
+        """
+        Uploads an in-memory file through the same resumable session as upload_stream.
+        """
+        return await self.upload_stream(session, _BytesReader(data), len(data), file_name, folder_id, mime_type)
+
+    def __getattr__(self, name):
+        attr = getattr(self.drive, name)
+        if not callable(attr) or name in self.LOCAL_METHODS:
+            return attr
+
+        @wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, partial(attr, *args, **kwargs))
+        return wrapper
+
 
 
 if __name__ == '__main__':
@@ -1,34 +1,67 @@
 import asyncio
-from hashlib import sha256
+import hashlib
+import json
 import os
 import re
 import tempfile
 from aiohttp import ClientSession
 import aiohttp
 from interactions import Extension, OptionType, SlashContext, Embed, EmbedField, EmbedFooter, Color
-from interactions.ext.paginators import Paginator
-from database import RedisDB
+from database import AsyncRedisDB
 
 import datetime, interactions
 
-from drive import Drive
+from blacklist_ids import get_blacklisted_ids
+from channels import get_channel_index
+from drive import AsyncDrive
+from jobs import get_job_queue
+from proof_cache import ProofImageCache
+from snapshot import write_snapshot
+from utils.fanout import fan_out, summarize
+from utils.images import THUMBNAIL_PREFIX, process_image_async
+from utils.lazy_paginator import LazyPaginator
+from whitelist import get_whitelist
 
 
 class BlacklistExtension(Extension):
-    WHITELIST_KEY = "whitelisted_users"
     FORCE_OVERRIDE_USER_ID = "708812851229229208"
-    BLACKLIST_CHANNEL_PATTERN = re.compile(r".*blacklist*.", re.IGNORECASE)
+    VIEW_IMAGES_DIRECT_PATTERN = re.compile(r"^view_images_direct(?::(\d+):(.+))?$")
     
     def __init__(self, bot):
         self.bot = bot
-        self.drive = Drive()
-        self.db_blacklist = RedisDB(db=0)
-        self.db_whitelist = RedisDB(db=1)
-        self.db_servers = RedisDB(db=2)
+        self.drive = AsyncDrive()
+        self.proof_cache = ProofImageCache(self.drive)
+        self.db_blacklist = AsyncRedisDB(db=0)
+        self.whitelist = get_whitelist()
+        self.db_servers = AsyncRedisDB(db=2)
+        self.jobs = get_job_queue()
+        self.channels = get_channel_index()
+        self.jobs.register("blacklist", self.run_blacklist)
+        self.jobs.register("unblacklist", self.run_unblacklist)
+        self._background_tasks = set()
+
+    @interactions.listen()
+    async def on_startup(self):
+        await self.whitelist.start()
+        await self.db_blacklist.start_cache_invalidation()
+        await self.jobs.start()
+        # Keep a reference so the task is not garbage-collected while it runs.
+        task = asyncio.create_task(self.prepare_blacklist())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def prepare_blacklist(self):
+        """
+        Migrates legacy records, then rebuilds the search indexes if they have never been built.
+        """
+        if await self.db_blacklist.needs_migration():
+            await self.db_blacklist.migrate_legacy_keys()
+        if await self.db_blacklist.needs_index_rebuild():
+            await self.db_blacklist.rebuild_indexes()
         
     async def is_user_whitelisted(self, user_id):
         if str(user_id) == self.FORCE_OVERRIDE_USER_ID: return True
-        return self.db_whitelist.redis.sismember(self.WHITELIST_KEY, str(user_id))
+        return await self.whitelist.contains(user_id)
         
     @interactions.slash_command(name="whitelist", description="Whitelist a user")
     @interactions.slash_option(
@@ -41,7 +74,7 @@ class BlacklistExtension(Extension):
         if str(ctx.author.id) != self.FORCE_OVERRIDE_USER_ID:
             await ctx.send("You are not authorized to modify the whitelist.", ephemeral=True)
             return
-        self.db_whitelist.redis.sadd(self.WHITELIST_KEY, str(user.id))
+        await self.whitelist.add(user.id)
         await ctx.send(f"User <@{user.id}> has been added to the whitelist.", ephemeral=True)
 
     @interactions.slash_command(name="unwhitelist", description="Unwhitelist a user")
@@ -56,10 +89,9 @@ class BlacklistExtension(Extension):
             await ctx.send("You are not authorized to modify the whitelist.", ephemeral=True)
             return
         
-        if not self.db_whitelist.redis.sismember(self.WHITELIST_KEY, str(user.id)):
+        if not await self.whitelist.remove(user.id):
             await ctx.send(f"User <@{user.id}> is not whitelisted.", ephemeral=True)
         else:
-            self.db_whitelist.redis.srem(self.WHITELIST_KEY, str(user.id))
             await ctx.send(f"User <@{user.id}> has been removed from the whitelist.", ephemeral=True)
 
     @interactions.slash_command(name="search", description="Search for a blacklisted user")
@@ -67,25 +99,27 @@ class BlacklistExtension(Extension):
         name="pattern",
         description="Pattern to search for in the blacklist",
         required=True,
-        opt_type=OptionType.STRING
+        opt_type=OptionType.STRING,
+        autocomplete=True,
     )
     async def search_blacklist(self, ctx: SlashContext, pattern: str):
         if not await self.is_user_whitelisted(ctx.author.id):
             await ctx.send("You are not whitelisted!", ephemeral=True)
             return
         
-        matched_data = self.db_blacklist.search_users(pattern)
+        matched_ids = await self.db_blacklist.search_user_ids(pattern)
         
-        if not matched_data:
+        if not matched_ids:
             await ctx.send(f"No blacklisted user found with the pattern `{pattern}`", ephemeral=True)
             return
         
-        embeds = []
-        for index, (user_id, user_info) in enumerate(matched_data):
-            username = user_info["username"]
-            reason = user_info["reason"]
-            proof_link = user_info["proof_link"]
-            embed = Embed(
+        async def render(index):
+            user_id = matched_ids[index]
+            user_info = await self.db_blacklist.get_user(user_id)
+            username = user_info.get("username", "N/A")
+            reason = user_info.get("reason", "N/A")
+            proof_link = user_info.get("proof_link", "N/A")
+            return Embed(
                 title=username,
                 description="Here's some detailed information about the user:",
                 color=Color.random(),
@@ -94,26 +128,61 @@ class BlacklistExtension(Extension):
                     EmbedField(name="📜 Reason", value=reason, inline=False),
                     EmbedField(name="🔗 Proof Link", value=f"[Click Here]({proof_link})", inline=False),
                 ],
-                footer=EmbedFooter(text=f"Blacklist System | Result {index + 1} of {len(matched_data)}"),
+                footer=EmbedFooter(text=f"Blacklist System | Result {index + 1} of {len(matched_ids)}"),
                 timestamp=datetime.datetime.now().isoformat()
             )
-            embeds.append(embed)
-        paginator = Paginator.create_from_embeds(self.bot, *embeds)
+        paginator = LazyPaginator.create_from_source(self.bot, len(matched_ids), render)
         await paginator.send(ctx, ephemeral=True)
 
+    @search_blacklist.autocomplete("pattern")
+    async def search_autocomplete(self, ctx: interactions.AutocompleteContext):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            return await ctx.send(choices=[])
+        matches = await self.db_blacklist.autocomplete_usernames(ctx.input_text)
+        await ctx.send(choices=[{"name": username, "value": username} for _, username in matches])
+
+    @interactions.slash_command(name="rebuild_indexes", description="Rebuild the blacklist search and ID indexes")
+    async def rebuild_indexes(self, ctx: SlashContext):
+        if str(ctx.author.id) != self.FORCE_OVERRIDE_USER_ID:
+            await ctx.send("You are not authorized to rebuild the indexes.", ephemeral=True)
+            return
+        await ctx.defer(ephemeral=True)
+        indexed = await self.db_blacklist.rebuild_indexes()
+        await ctx.send(f"Rebuilt the indexes for {indexed} blacklisted users.", ephemeral=True)
+
+    @interactions.slash_command(name="migrate_keys", description="Move legacy blacklist records to the namespaced key layout")
+    async def migrate_keys(self, ctx: SlashContext):
+        if str(ctx.author.id) != self.FORCE_OVERRIDE_USER_ID:
+            await ctx.send("You are not authorized to migrate the blacklist.", ephemeral=True)
+            return
+        await ctx.defer(ephemeral=True)
+        migrated = await self.db_blacklist.migrate_legacy_keys()
+        await ctx.send(f"Migrated {migrated} blacklisted users to the namespaced key layout.", ephemeral=True)
+
+    @interactions.slash_command(name="export_snapshot", description="Write the blacklist to a snapshot file for fast startup")
+    async def export_snapshot(self, ctx: SlashContext):
+        if str(ctx.author.id) != self.FORCE_OVERRIDE_USER_ID:
+            await ctx.send("You are not authorized to export the blacklist.", ephemeral=True)
+            return
+        await ctx.defer(ephemeral=True)
+        version = await write_snapshot(self.db_blacklist)
+        # Swap the running ID set onto the new file so it drops the changes it now contains.
+        await get_blacklisted_ids().reload()
+        await ctx.send(f"Exported the blacklist snapshot at version {version}.", ephemeral=True)
+
     @interactions.slash_command(name="list-whitelist", description="List all whitelisted users")
     async def list_whitelist(self, ctx: SlashContext):
         if not await self.is_user_whitelisted(ctx.author.id):
             await ctx.send("You are not whitelisted!", ephemeral=True)
             return
         
-        whitelisted_ids = self.db_whitelist.redis.smembers(self.WHITELIST_KEY)
+        whitelisted_ids = await self.whitelist.members()
         if not whitelisted_ids:
             await ctx.send("There are no whitelisted users.", ephemeral=True)
             return
 
         # Prepare user mentions
-        whitelisted_users = [f"<@{user_id.decode('utf-8')}>" for user_id in whitelisted_ids]
+        whitelisted_users = [f"<@{user_id}>" for user_id in sorted(whitelisted_ids)]
 
         # Handle potential message length limitations
         MAX_EMBED_FIELD_VALUE_LEN = 1024
@@ -137,19 +206,21 @@ class BlacklistExtension(Extension):
             await ctx.send("You are not whitelisted!", ephemeral=True)
             return
         
-        keys_values = self.db_blacklist.list_all_users_info()
-        if not keys_values:
+        count = await self.db_blacklist.count_users()
+        if not count:
             await ctx.send("There are no blacklisted users.", ephemeral=True)
             return
-        
-        embeds = []
-        for index, (user_id, user_info) in enumerate(keys_values.items()):
+
+        async def render(index):
+            user_ids = await self.db_blacklist.get_user_ids_page(index, 1)
+            user_id = user_ids[0] if user_ids else "N/A"
+            user_info = await self.db_blacklist.get_user(user_id) if user_ids else {}
             username = user_info.get("username", "N/A")
             reason = user_info.get("reason", "N/A")
             proof_link = user_info.get("proof_link", "N/A")
             folder_id = user_info.get("folder_id", "N/A")
 
-            embed = Embed(
+            return Embed(
                 title=f"{username}",
                 description="Here's some detailed information about the user:",
                 color=Color.random(),
@@ -159,14 +230,33 @@ class BlacklistExtension(Extension):
                     EmbedField(name="🔗 Proof Link", value=f"[Click Here]({proof_link})", inline=False),
                     EmbedField(name="Folder ID", value=f"`{folder_id}`", inline=True),
                 ],
-                footer=EmbedFooter(text=f"Blacklist System | Page {index + 1} of {len(keys_values)}"),
+                footer=EmbedFooter(text=f"Blacklist System | Page {index + 1} of {count}"),
                 timestamp=datetime.datetime.now().isoformat()
             )
-            embeds.append(embed)
         
-        paginator = Paginator.create_from_embeds(self.bot, *embeds)
+        paginator = LazyPaginator.create_from_source(self.bot, count, render)
         await paginator.send(ctx, ephemeral=True)
     
+    @interactions.slash_command(name="export", description="Export the blacklist as a JSON file")
+    async def export_blacklist(self, ctx: SlashContext):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            await ctx.send("You are not whitelisted!", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        try:
+            count = 0
+            with os.fdopen(fd, 'w', encoding='utf-8') as export_file:
+                export_file.write("{")
+                async for user_id, user_info in self.db_blacklist.iter_users_info():
+                    export_file.write(f"{',' if count else ''}\n  {json.dumps(user_id)}: {json.dumps(user_info, ensure_ascii=False)}")
+                    count += 1
+                export_file.write("\n}\n")
+            await ctx.send(f"Exported {count} blacklisted users.", file=interactions.File(path, file_name="users.json"), ephemeral=True)
+        finally:
+            os.unlink(path)
+    
     @interactions.slash_command(name="blacklist", description="Blacklist a user")
     @interactions.slash_option(
         name="user",
@@ -216,34 +306,78 @@ class BlacklistExtension(Extension):
             return
         
         await ctx.defer(ephemeral=True)
-        folder_id = self.drive.create_folder(f"blacklist-{user.username}")
+        folder_id = await self.drive.create_folder(f"blacklist-{user.username}")
 
         files = [file1, file2, file3, file4, file5]
         files = [file for file in files if file is not None]
 
-        async with aiohttp.ClientSession() as session:
-            for image in files:
+        async def upload(session, number, image):
+            # Normalizes the attachment in a worker process, then uploads it next to its thumbnail.
+            # Attachments Pillow cannot handle are uploaded as they are, without a thumbnail.
+            # Files are named "<number>-<hash prefix>" rather than after the attachment, since
+            # pasted screenshots are all called image.png and thumbnails are paired by name.
+            try:
                 async with session.get(image.url) as resp:
                     if resp.status != 200 or resp.content_type not in ["image/png", "image/jpeg", "image/gif"]:
                         print(f"Failed to download image or invalid content type for {image.url}")
-                        continue
-                    fd, path = tempfile.mkstemp(suffix=".png")
+                        return
+                    data = await resp.read()
+                    content_type = resp.content_type
+                digest = hashlib.sha256(data).hexdigest()
+                name = f"{number}-{digest[:12]}"
+                original_extension = os.path.splitext(image.filename)[1]
+                known = await self.db_blacklist.get_proof_image(digest)
+                if known:
+                    # The same screenshot was uploaded for an earlier entry; link it instead.
                     try:
-                        with os.fdopen(fd, 'wb') as tmp: tmp.write(await resp.read())
-                        self.drive.upload_file(path, folder_id)
-                    finally:
-                        os.unlink(path)
+                        file_id, thumbnail_id, extension = known
+                        await asyncio.gather(
+                            self.drive.create_shortcut(file_id, folder_id, f"{name}{extension or original_extension}"),
+                            self.drive.create_shortcut(thumbnail_id, folder_id, f"{THUMBNAIL_PREFIX}{name}.jpg"),
+                        )
+                        return
+                    except Exception as e:
+                        print(f"Failed to link known image {digest}, uploading it again: {e}")
+                        await self.db_blacklist.remove_proof_image(digest)
+                try:
+                    processed = await process_image_async(data)
+                except Exception as e:
+                    # Pillow could not decode it, or refused it as a decompression bomb; keep the original.
+                    print(f"Failed to process image {image.url}, uploading it unchanged: {e}")
+                    await self.drive.upload_bytes(session, data, f"{name}{original_extension}", folder_id, content_type)
+                    return
+                file_id, thumbnail_id = await asyncio.gather(
+                    self.drive.upload_bytes(session, processed.data, f"{name}{processed.extension}", folder_id, processed.mime_type),
+                    self.drive.upload_bytes(session, processed.thumbnail, f"{THUMBNAIL_PREFIX}{name}.jpg", folder_id, "image/jpeg"),
+                )
+                await self.db_blacklist.set_proof_image(digest, file_id, thumbnail_id, processed.extension)
+            except Exception as e:
+                print(f"Failed to upload image {image.url}: {e}")
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(upload(session, number, image) for number, image in enumerate(files, start=1)))
 
         folder_link = self.drive.get_folder_link(folder_id)
 
+        await self.db_blacklist.set_user(str(user.id), user.username, reason, folder_link, folder_id)
+        job_id = await self.jobs.enqueue(
+            "blacklist", user_id=str(user.id), username=user.username,
+            reason=reason, folder_link=folder_link, folder_id=folder_id,
+        )
+        await ctx.send(f"User has been blacklisted! Bans are being applied in job `{job_id}`; use /sync_status to check on it.", ephemeral=True)
+
+    def blacklist_message(self, params):
+        """
+        Builds the embed and buttons announcing a new blacklist entry.
+        """
         embed = Embed(
-            title=f"{user.username} has been blacklisted!",
+            title=f"{params['username']} has been blacklisted!",
             description=f"Here's some detailed information about the blacklist:",
             color=Color.random(),
             fields=[
-                EmbedField(name="User ID", value=f"`{user.id}`", inline=True),
-                EmbedField(name="📜 Reason", value=f"*{reason}*", inline=False),
-                EmbedField(name="🔗 Proof Link", value=f"[Click Here]({folder_link})", inline=False),
+                EmbedField(name="User ID", value=f"`{params['user_id']}`", inline=True),
+                EmbedField(name="📜 Reason", value=f"*{params['reason']}*", inline=False),
+                EmbedField(name="🔗 Proof Link", value=f"[Click Here]({params['folder_link']})", inline=False),
             ],
             footer=EmbedFooter(text="Blacklist System"),
             timestamp=datetime.datetime.now().isoformat()
@@ -252,69 +386,68 @@ class BlacklistExtension(Extension):
         view_images_link_button = interactions.Button(
             style=interactions.ButtonStyle.LINK,
             label="View Images",
-            url=folder_link
+            url=params['folder_link']
         )
         
         view_images_direct_button = interactions.Button(
             style=interactions.ButtonStyle.SECONDARY,
             label="View Images Direct",
-            custom_id="view_images_direct"
+            custom_id=f"view_images_direct:1:{params['folder_id']}"
         )
         
         action_row = interactions.ActionRow()
         action_row.components.append(view_images_link_button)
         action_row.components.append(view_images_direct_button)
-        
-        await ctx.send("User has been blacklisted!", ephemeral=True)
-        # await ctx.send(embed=embed, components=[action_row], ephemeral=True)
-        self.db_blacklist.set_user(str(user.id), user.username, reason, folder_link, folder_id)
-        keys_values = self.db_blacklist.list_all_users_info()
-        current_sync_hash = sha256(str(keys_values).encode('utf-8')).hexdigest()
-        for guild in self.bot.guilds:
-            try:
-                if not guild.me.guild_permissions.BAN_MEMBERS:
-                    print(f"Missing ban permissions in guild: {guild.name}")
-                    ctx.send("I don't have permission to ban members in this server.", ephemeral=True)
-                    continue
-                await guild.ban(user.id, reason=f"Blacklisted: {reason}")
-            
-                blacklist_channel = next((channel for channel in guild.channels if self.BLACKLIST_CHANNEL_PATTERN.match(channel.name) or channel.name in ["blacklist", "blacklists"]), None)
-                if not blacklist_channel:
-                    print(f"Blacklist channel not found in guild {guild.name}")
-                    continue
-                
-                await blacklist_channel.send(embed=embed, components=[action_row])
-            except Exception as e:
-                print(f"Failed to ban or send embed in guild {guild.name}: {e}")
-            self.db_servers.set_last_sync_details(str(guild.id), current_sync_hash)
+        return embed, action_row
+
+    async def run_blacklist(self, job_id, params):
+        """
+        Job handler that bans a newly blacklisted user in every guild and announces it.
+        Guilds that already have the post are skipped, so a retried job never posts twice.
+        """
+        user_id = params['user_id']
+        embed, action_row = self.blacklist_message(params)
+
+        async def blacklist_in_guild(guild):
+            if await self.db_servers.is_guild_applied(str(guild.id), user_id, kind="posts"):
+                return None
+            if not guild.me.guild_permissions.BAN_MEMBERS:
+                raise PermissionError("missing ban permission")
+            await guild.ban(user_id, reason=f"Blacklisted: {params['reason']}")
+            # last_sync_hash is left alone: only a full sync may mark the guild up to date,
+            # since earlier bans in it may have failed.
+            await self.db_servers.add_guild_applied(str(guild.id), [user_id], kind="bans")
+
+            blacklist_channels = await self.channels.get_channels(guild)
+            if not blacklist_channels:
+                return "banned, no blacklist channel"
+            await blacklist_channels[0].send(embed=embed, components=[action_row])
+            await self.db_servers.add_guild_applied(str(guild.id), [user_id], kind="posts")
+            return None
+
+        await self.jobs.update(job_id, stage="guilds", total=len(self.bot.guilds))
+        results = await fan_out(self.bot.guilds, blacklist_in_guild)
+        return summarize(results, f"Blacklisted {params['username']}")
     
-    @interactions.component_callback("view_images_direct")
+    @interactions.component_callback(VIEW_IMAGES_DIRECT_PATTERN)
     async def view_images_direct_clicked(self, ctx: interactions.ComponentContext):
-        if not ctx.message.embeds[0].fields[3].value:
+        # Buttons carry "view_images_direct:<entry number>:<folder id>"; older
+        # single-embed messages only have the folder ID in the embed's fourth field.
+        match = self.VIEW_IMAGES_DIRECT_PATTERN.match(ctx.custom_id)
+        if match.group(2):
+            folder_id = match.group(2)
+        elif len(ctx.message.embeds[0].fields) > 3 and ctx.message.embeds[0].fields[3].value:
+            folder_id = ctx.message.embeds[0].fields[3].value.strip("`")
+        else:
             await ctx.send("No images found in the folder.", ephemeral=True)
             return
-        folder_id = ctx.message.embeds[0].fields[3].value
         await ctx.send("Processing images...", ephemeral=True)
         
-        image_files = self.drive.list_files(folder_id, images_only=True)
-        if not image_files:
+        images = await self.proof_cache.get_folder_images(folder_id)
+        if not images:
             await ctx.send("No images found in the folder.", ephemeral=True)
             return
-
-        image_files = image_files[:10]
-        files = []
-        temp_dir = tempfile.TemporaryDirectory()
-        
-        try:
-            for image_file in image_files:
-                file_id = image_file['id']
-                filename = image_file['name']
-                temp_file_path = os.path.join(temp_dir.name, filename)
-                self.drive.download_file(file_id, temp_file_path)
-                files.append(temp_file_path)
-            await ctx.send(files=files, ephemeral=True)
-        finally:
-            temp_dir.cleanup()
+        await ctx.send(files=[interactions.File(path, file_name=name) for path, name in images], ephemeral=True)
     
     @interactions.slash_command(name="unblacklist", description="Unblacklist a user")
     @interactions.slash_option(
@@ -328,13 +461,67 @@ class BlacklistExtension(Extension):
             await ctx.send("You are not whitelisted!", ephemeral=True)
             return
         
-        if not self.db_blacklist.exists(str(user.id)):
-            await ctx.send(f"User <@{user.id}> is not blacklisted.", ephemeral=True)
+        await self.remove_from_blacklist(ctx, str(user.id), user.username)
+
+    @interactions.slash_command(name="unblacklist_username", description="Unblacklist a user by their blacklisted username")
+    @interactions.slash_option(
+        name="username",
+        description="Username of the blacklisted user",
+        required=True,
+        opt_type=OptionType.STRING,
+        autocomplete=True,
+    )
+    async def unblacklist_username(self, ctx: SlashContext, username: str):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            await ctx.send("You are not whitelisted!", ephemeral=True)
+            return
+
+        # Autocomplete choices carry the user ID; typed text is matched on the exact username.
+        if username.isdigit() and await self.db_blacklist.exists(username):
+            user_id = username
         else:
-            self.db_blacklist.delete_user(str(user.id))
-            await ctx.send(f"User <@{user.id}> has been removed from the blacklist.", ephemeral=True)
-        for guild in self.bot.guilds:
+            matches = [user_id for user_id, name in await self.db_blacklist.autocomplete_usernames(username) if name == username.lower()]
+            if len(matches) != 1:
+                await ctx.send(f"{'No' if not matches else 'More than one'} blacklisted user found with the username `{username}`. Pick one from the suggestions.", ephemeral=True)
+                return
+            user_id = matches[0]
+        user_info = await self.db_blacklist.get_user(user_id)
+        await self.remove_from_blacklist(ctx, user_id, user_info.get("username", user_id))
+
+    @unblacklist_username.autocomplete("username")
+    async def unblacklist_username_autocomplete(self, ctx: interactions.AutocompleteContext):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            return await ctx.send(choices=[])
+        matches = await self.db_blacklist.autocomplete_usernames(ctx.input_text)
+        await ctx.send(choices=[{"name": f"{username} ({user_id})", "value": user_id} for user_id, username in matches])
+
+    async def remove_from_blacklist(self, ctx, user_id, username):
+        if not await self.db_blacklist.exists(user_id):
+            await ctx.send(f"User <@{user_id}> is not blacklisted.", ephemeral=True)
+        else:
+            await self.db_blacklist.delete_user(user_id)
+            await ctx.send(f"User <@{user_id}> has been removed from the blacklist.", ephemeral=True)
+
+        job_id = await self.jobs.enqueue("unblacklist", user_id=user_id, username=username)
+        await ctx.send(f"Unbans are being applied in job `{job_id}`; use /sync_status to check on it.", ephemeral=True)
+
+    async def run_unblacklist(self, job_id, params):
+        """
+        Job handler that lifts a user's bans in every guild. Unbanning twice is harmless.
+        """
+        user_id = params['user_id']
+
+        async def unban_in_guild(guild):
+            # The markers are only dropped once the ban is gone, so a failed unban is retried.
+            detail = None
             try:
-                await guild.unban(user)
-            except Exception as e:
-                print(f"Failed to unban user {user} in guild {guild.name}: {e}")
\ No newline at end of file
+                await guild.unban(user_id)
+            except interactions.errors.NotFound:
+                detail = "was not banned"
+            await self.db_servers.remove_guild_applied(str(guild.id), [user_id], kind="bans")
+            await self.db_servers.remove_guild_applied(str(guild.id), [user_id], kind="posts")
+            return detail
+
+        await self.jobs.update(job_id, stage="guilds", total=len(self.bot.guilds))
+        results = await fan_out(self.bot.guilds, unban_in_guild)
+        return summarize(results, f"Unbanned {params['username']}")
@@ -0,0 +1,78 @@
+from interactions import Extension, OptionType, SlashContext, GuildChannel
+import interactions
+
+from channels import get_channel_index
+from whitelist import get_whitelist
+
+
+class ChannelIndexExtension(Extension):
+    FORCE_OVERRIDE_USER_ID = "708812851229229208"
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channels = get_channel_index()
+        self.whitelist = get_whitelist()
+
+    @interactions.listen()
+    async def on_startup(self):
+        await self.whitelist.start()
+        await self.channels.load()
+        for guild in self.bot.guilds:
+            if not self.channels.is_indexed(guild.id):
+                await self.channels.rebuild(guild)
+
+    @interactions.listen()
+    async def on_guild_join(self, event: interactions.events.GuildJoin):
+        if self.bot.is_ready:
+            await self.channels.rebuild(event.guild)
+
+    @interactions.listen()
+    async def on_guild_left(self, event: interactions.events.GuildLeft):
+        await self.channels.forget_guild(event.guild_id)
+
+    @interactions.listen()
+    async def on_channel_create(self, event: interactions.events.ChannelCreate):
+        if isinstance(event.channel, GuildChannel):
+            await self.channels.channel_changed(event.channel)
+
+    @interactions.listen()
+    async def on_channel_update(self, event: interactions.events.ChannelUpdate):
+        if isinstance(event.after, GuildChannel):
+            await self.channels.channel_changed(event.after)
+
+    @interactions.listen()
+    async def on_channel_delete(self, event: interactions.events.ChannelDelete):
+        if isinstance(event.channel, GuildChannel):
+            await self.channels.channel_deleted(event.channel)
+
+    async def is_user_whitelisted(self, user_id):
+        if str(user_id) == self.FORCE_OVERRIDE_USER_ID: return True
+        return await self.whitelist.contains(user_id)
+
+    @interactions.slash_command(name="set_blacklist_channel", description="Choose the channel blacklist entries are posted in")
+    @interactions.slash_option(
+        name="channel",
+        description="The channel to post in; leave empty to detect it from channel names again",
+        required=False,
+        opt_type=OptionType.CHANNEL,
+    )
+    async def set_blacklist_channel(self, ctx: SlashContext, channel: GuildChannel = None):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            await ctx.send("You are not whitelisted!", ephemeral=True)
+            return
+        if not ctx.guild:
+            await ctx.send("This command cannot be used in DMs.", ephemeral=True)
+            return
+
+        if channel is None:
+            await self.channels.clear_override(ctx.guild.id)
+            detected = await self.channels.rebuild(ctx.guild)
+            mentions = ", ".join(f"<#{channel_id}>" for channel_id in detected) or "none"
+            await ctx.send(f"Blacklist channel override cleared. Detected channels: {mentions}", ephemeral=True)
+            return
+
+        if channel.guild.id != ctx.guild.id or not isinstance(channel, interactions.MessageableMixin):
+            await ctx.send("Please pick a text channel in this server.", ephemeral=True)
+            return
+        await self.channels.set_override(ctx.guild.id, channel.id)
+        await ctx.send(f"Blacklist entries in this server will be posted in <#{channel.id}>.", ephemeral=True)
@@ -1,7 +1,7 @@
 import datetime
 from interactions import Button, ButtonStyle, Embed, EmbedField, Extension, Color, OptionType
 import interactions
-from redis import Redis
+from redis.asyncio import Redis
 
 class ModerationExtension(Extension):
     def __init__(self, bot):
@@ -31,17 +31,17 @@ class ModerationExtension(Extension):
         opt_type=OptionType.STRING
     )
     async def warn(self, ctx, user, reason):
-        warns = self.warndb.get(user.id)
+        warns = await self.warndb.get(user.id)
         if warns is None: warns = 0
         else: warns = int(warns)
         warns += 1
-        self.warndb.set(user.id, warns)
-        instances = self.instancedb.get(user.id)
+        await self.warndb.set(user.id, warns)
+        instances = await self.instancedb.get(user.id)
         if instances is None: instances = 0
         else: instances = int(instances)
         if warns == 3:
             instances += 1
-            self.instancedb.set(user.id, instances)
+            await self.instancedb.set(user.id, instances)
             if instances == 1:
                 timeout_until = datetime.datetime.now(datetime.timezone.utc) + self.TIMEOUT_FIRST_INSTANCE
                 timeout_str = "5 minutes"
@@ -52,7 +52,7 @@ class ModerationExtension(Extension):
                 timeout_until = datetime.datetime.now(datetime.timezone.utc) + self.TIMEOUT_THIRD_INSTANCE
                 timeout_str = "1 day"
             await ctx.guild.get_member(user.id).timeout(timeout_until, reason=reason)
-            self.warndb.set(user.id, 0)
+            await self.warndb.set(user.id, 0)
             timeout_embed = Embed(
                 title="User Timed Out", 
                 color=Color.random(),
@@ -80,8 +80,8 @@ class ModerationExtension(Extension):
         opt_type=OptionType.USER
     )
     async def warns(self, ctx, user):
-        warns = self.warndb.get(user.id)
-        instances = self.instancedb.get(user.id)
+        warns = await self.warndb.get(user.id)
+        instances = await self.instancedb.get(user.id)
         if warns is None: warns = 0
         else: warns = int(warns)
         if instances is None: instances = 0
@@ -105,8 +105,8 @@ class ModerationExtension(Extension):
         opt_type=OptionType.USER
     )
     async def clearwarns(self, ctx, user):
-        self.warndb.delete(user.id)
-        self.instancedb.delete(user.id)
+        await self.warndb.delete(user.id)
+        await self.instancedb.delete(user.id)
         clear_embed = Embed(
             title="Warnings Cleared",
             color=Color.random(),
@@ -1,26 +1,67 @@
-from hashlib import sha256
 import datetime
-import re
 from typing import Dict
-from interactions import Button, ButtonStyle, Embed, EmbedField, Extension, Color
+from interactions import Button, ButtonStyle, Embed, EmbedField, Extension, Color, spread_to_rows
+from interactions.api.http.route import Route
 import interactions
 
-from database import RedisDB
+from blacklist_ids import get_blacklisted_ids
+from channels import get_channel_index
+from database import AsyncRedisDB
+from jobs import get_job_queue
+from whitelist import get_whitelist
 
 class SyncBlacklistsExtension(Extension):
-    WHITELIST_KEY = "whitelisted_users"
     FORCE_OVERRIDE_USER_ID = "708812851229229208"
-    BLACKLIST_CHANNEL_PATTERN = re.compile(r'.*blacklist*.', re.IGNORECASE)
+    # Discord's bulk-ban endpoint accepts at most 200 user IDs per request.
+    BULK_BAN_LIMIT = 200
+    # Discord allows up to 10 embeds and 5 rows of 5 buttons per message, and 6000 characters
+    # across all of a message's embeds; a field value holds at most 1024.
+    EMBEDS_PER_MESSAGE = 10
+    EMBED_CHARACTERS_PER_MESSAGE = 6000
+    EMBED_FIELD_VALUE_LENGTH = 1024
     
     def __init__(self, bot):
         self.bot = bot
-        self.db = RedisDB(db=0)
-        self.db_whitelist = RedisDB(db=1)
-        self.db_servers = RedisDB(db=2)
+        self.db = AsyncRedisDB(db=0)
+        self.whitelist = get_whitelist()
+        self.db_servers = AsyncRedisDB(db=2)
+        self.jobs = get_job_queue()
+        self.channels = get_channel_index()
+        self.blacklisted_ids = get_blacklisted_ids()
+        self.jobs.register("sync_blacklists", self.run_sync_blacklists)
+        self.jobs.register("syncbans", self.run_syncbans)
+
+    @interactions.listen()
+    async def on_startup(self):
+        await self.whitelist.start()
+        await self.db.start_cache_invalidation()
+        await self.jobs.start()
+        await self.blacklisted_ids.start()
         
+    @interactions.listen()
+    async def on_member_add(self, event: interactions.events.MemberAdd):
+        # Checked in memory, so ordinary joins cost no Redis round trip even during a raid.
+        if not await self.blacklisted_ids.contains(event.member.id):
+            return
+        guild = event.guild
+        user_id = str(event.member.id)
+        if await self.is_user_whitelisted(user_id) or not guild.me.guild_permissions.BAN_MEMBERS:
+            return
+        if await self.try_ban(guild, user_id):
+            await self.db_servers.add_guild_applied(str(guild.id), [user_id], kind="bans")
+
     async def is_user_whitelisted(self, user_id):
         if str(user_id) == self.FORCE_OVERRIDE_USER_ID: return True
-        return self.db_whitelist.redis.sismember(self.WHITELIST_KEY, str(user_id))
+        return await self.whitelist.contains(user_id)
+
+    async def filter_whitelisted(self, user_ids):
+        """
+        Returns the whitelisted subset of user_ids from the in-process whitelist.
+        """
+        whitelisted = await self.whitelist.filter(user_ids)
+        if self.FORCE_OVERRIDE_USER_ID in map(str, user_ids):
+            whitelisted.add(self.FORCE_OVERRIDE_USER_ID)
+        return whitelisted
     
     @interactions.slash_command(
         name="sync_blacklists",
@@ -30,17 +71,6 @@ class SyncBlacklistsExtension(Extension):
         if not await self.is_user_whitelisted(ctx.author.id):
             await ctx.send("You are not whitelisted!", ephemeral=True)
             return
-        
-        await ctx.defer(ephemeral=True)
-        msg = await ctx.send("Syncing blacklists...")
-
-        keys_values = self.db.list_all_users_info()
-        if not keys_values:
-            await ctx.send("There are no blacklisted users.", ephemeral=True)
-            return
-
-        current_sync_hash = sha256(str(keys_values).encode('utf-8')).hexdigest()
-        print(f"current_sync_hash: {current_sync_hash}")
 
         guild = ctx.guild
         if not guild:
@@ -51,64 +81,133 @@ class SyncBlacklistsExtension(Extension):
             await ctx.send("I do not have permission to ban members in this server.", ephemeral=True)
             return
 
-        if self.db_servers.check_if_guild_synced(str(guild.id), current_sync_hash):
-            sync_details = self.db_servers.get_sync_details(str(guild.id))
+        current_sync_hash = await self.db.get_blacklist_version()
+        if await self.db_servers.check_if_guild_synced(str(guild.id), current_sync_hash):
+            sync_details = await self.db_servers.get_sync_details(str(guild.id))
             users_synced = sync_details.get("count", 'N/A')
             channel_id = sync_details.get("channel_id", 'N/A')
             await ctx.send(f"Blacklist in this guild is already up to date. Channel ID: {channel_id}, Users Synced: {users_synced}", ephemeral=True)
             return
 
-        guild_synced_count = 0
+        job_id = await self.jobs.enqueue("sync_blacklists", guild_id=str(guild.id), requested_by=ctx.author.display_name)
+        await ctx.send(f"Queued sync job `{job_id}`. Use /sync_status to check on it.", ephemeral=True)
 
-        for user_id in keys_values.keys():
-            try:
-                await guild.ban(user_id, reason="Blacklisted by the bot.")
-                guild_synced_count += 1
-            except Exception as e:
-                print(f"Error banning user {user_id} in guild {guild.id}: {e}")
+    async def run_sync_blacklists(self, job_id, params):
+        """
+        Job handler for /sync_blacklists. Bans, unbans and posts are recorded in the
+        guild's applied sets as they happen, so a retried job picks up where it stopped.
+        """
+        guild = self.bot.get_guild(params["guild_id"])
+        if not guild:
+            raise LookupError(f"guild {params['guild_id']} is not available")
+
+        current_sync_hash = await self.db.get_blacklist_version()
+        print(f"current_sync_hash: {current_sync_hash}")
+        if await self.db_servers.check_if_guild_synced(str(guild.id), current_sync_hash):
+            return "Blacklist in this guild is already up to date."
+
+        blacklisted_ids = await self.db.list_user_ids()
+        await self.jobs.update(job_id, stage="bans", total=len(blacklisted_ids))
+        banned, failed, unbanned = await self.apply_ban_delta(guild, blacklisted_ids)
+        await self.jobs.update(job_id, banned=len(banned), failed=len(failed), unbanned=len(unbanned))
+        if not blacklisted_ids and not unbanned:
+            return "There are no blacklisted users."
 
-        blacklist_channels = [channel for channel in guild.channels if self.BLACKLIST_CHANNEL_PATTERN.match(channel.name) or channel.name in ["blacklist", "blacklists"]]
+        blacklist_channels = await self.channels.get_channels(guild)
         if not blacklist_channels:
             print(f"Blacklist channel not found in guild {guild.id}.")
-            await ctx.send(f"Blacklist channel not found in this guild.", ephemeral=True)
-            return
+            return f"Synced {len(banned)} new bans and {len(unbanned)} unbans, but no blacklist channel was found in this guild.{self.format_failed_bans(failed)}"
         print(blacklist_channels)
 
-        for user_id, user_info in keys_values.items():
-            embed = Embed(
-                title=f"{user_info.get('username', 'N/A')} has been blacklisted!",
-                description=f"Here's some detailed information about the blacklist:",
-                color=Color.random(),
-                fields=[
-                    EmbedField(name="User ID", value=f"`{user_id}`", inline=True),
-                    EmbedField(name="📜 Reason", value=f"*{user_info.get('reason', 'N/A')}*", inline=False),
-                    EmbedField(name="🔗 Proof Link", value=f"[Click Here]({user_info.get('proof_link', 'N/A')})", inline=False),
-                    EmbedField(name="Folder ID", value=f"`{user_info.get('folder_id', 'N/A')}`", inline=True),
-                ],
-                footer=f"Blacklist synced by {ctx.author.display_name}",
-                timestamp=datetime.datetime.now().isoformat(),
-            )
-            view_images_link_button = Button(
-                style=ButtonStyle.LINK,
-                label="View Images",
-                url=user_info.get('proof_link', 'N/A'),
-            )
-            view_images_direct_button = Button(
-                style=ButtonStyle.PRIMARY,
-                label="View Images Directly",
-                custom_id="view_images_direct",
-            )
-            action_row = interactions.ActionRow(view_images_link_button, view_images_direct_button)
-            for blacklist_channel in blacklist_channels:
-                await blacklist_channel.send(embed=embed, components=[action_row], ephemeral=True)
-        
-        if blacklist_channels:
-            first_blacklist_channel_id = blacklist_channels[0].id
-            self.db_servers.set_last_sync_details(str(guild.id), current_sync_hash)
-            self.db_servers.record_sync_details(str(guild.id), first_blacklist_channel_id, str(len(keys_values)))
+        await self.jobs.update(job_id, stage="posts")
+        applied_posts = await self.db_servers.get_guild_applied(str(guild.id), kind="posts")
+        footer = f"Blacklist synced by {params['requested_by']}"
+        posted = []
+        batch, characters = [], 0
+        async for user_id, user_info in self.db.iter_users_info(sorted(blacklisted_ids - applied_posts)):
+            # Sized with the widest entry number, so the embeds' numbering cannot push a batch over.
+            size = len(self.entry_embed(self.EMBEDS_PER_MESSAGE, user_id, user_info, footer))
+            if batch and characters + size > self.EMBED_CHARACTERS_PER_MESSAGE:
+                posted += await self.post_batch(guild, blacklist_channels, batch, footer)
+                await self.jobs.update(job_id, posted=len(posted))
+                batch, characters = [], 0
+            batch.append((user_id, user_info))
+            characters += size
+            if len(batch) == self.EMBEDS_PER_MESSAGE:
+                posted += await self.post_batch(guild, blacklist_channels, batch, footer)
+                await self.jobs.update(job_id, posted=len(posted))
+                batch, characters = [], 0
+        if batch:
+            posted += await self.post_batch(guild, blacklist_channels, batch, footer)
+            await self.jobs.update(job_id, posted=len(posted))
+        await self.db_servers.remove_guild_applied(str(guild.id), applied_posts - blacklisted_ids, kind="posts")
+
+        first_blacklist_channel_id = blacklist_channels[0].id
+        await self.db_servers.set_last_sync_details(str(guild.id), current_sync_hash)
+        await self.db_servers.record_sync_details(str(guild.id), first_blacklist_channel_id, str(len(blacklisted_ids)))
+
+        return f"Synced {len(banned)} new bans, {len(unbanned)} unbans and {len(posted)} new entries in this guild. Channel ID: {first_blacklist_channel_id}{self.format_failed_bans(failed)}"
 
-        await ctx.send(f"Synced {guild_synced_count} blacklisted users in this guild. Channel ID: {blacklist_channel.id}", ephemeral=True)
-        await ctx.edit(content="Syncing blacklists completed.", message=msg)
+    async def post_batch(self, guild, channels, entries, footer):
+        """
+        Posts a batch and marks it applied right away, so it is not posted twice if the job is retried.
+        """
+        posted = await self.post_entries(channels, entries, footer)
+        await self.db_servers.add_guild_applied(str(guild.id), posted, kind="posts")
+        return posted
+
+    def entry_embed(self, number, user_id, user_info, footer):
+        reason = user_info.get('reason', 'N/A')
+        if len(reason) + 2 > self.EMBED_FIELD_VALUE_LENGTH:
+            reason = reason[:self.EMBED_FIELD_VALUE_LENGTH - 3] + "…"
+        return Embed(
+            title=f"#{number} {user_info.get('username', 'N/A')} has been blacklisted!",
+            description=f"Here's some detailed information about the blacklist:",
+            color=Color.random(),
+            fields=[
+                EmbedField(name="User ID", value=f"`{user_id}`", inline=True),
+                EmbedField(name="📜 Reason", value=f"*{reason}*", inline=False),
+                EmbedField(name="🔗 Proof Link", value=f"[Click Here]({user_info.get('proof_link', 'N/A')})", inline=False),
+                EmbedField(name="Folder ID", value=f"`{user_info.get('folder_id', 'N/A')}`", inline=True),
+            ],
+            footer=footer,
+            timestamp=datetime.datetime.now().isoformat(),
+        )
+
+    async def post_entries(self, channels, entries, footer):
+        """
+        Posts up to EMBEDS_PER_MESSAGE blacklist entries, within EMBED_CHARACTERS_PER_MESSAGE,
+        as a single message to each channel.
+        Every entry keeps its own numbered "Images" link and "Direct" button; the direct
+        button carries the folder ID in its custom_id so it works in a multi-embed message.
+        Returns the user_ids posted, or an empty list if no channel accepted the message.
+        A batch that reached some channels counts as posted, so a retry does not repeat it there.
+        """
+        embeds, buttons = [], []
+        for number, (user_id, user_info) in enumerate(entries, start=1):
+            proof_link = user_info.get('proof_link', 'N/A')
+            folder_id = user_info.get('folder_id', 'N/A')
+            embeds.append(self.entry_embed(number, user_id, user_info, footer))
+            if proof_link.startswith("http"):
+                buttons.append(Button(
+                    style=ButtonStyle.LINK,
+                    label=f"#{number} View Images",
+                    url=proof_link,
+                ))
+            buttons.append(Button(
+                style=ButtonStyle.PRIMARY,
+                label=f"#{number} View Images Directly",
+                custom_id=f"view_images_direct:{number}:{folder_id}",
+            ))
+        components = spread_to_rows(*buttons)
+        sent = False
+        for channel in channels:
+            try:
+                await channel.send(embeds=embeds, components=components)
+                sent = True
+            except Exception as e:
+                print(f"Error posting {len(entries)} blacklist entries to channel {channel.id}: {e}")
+        return [user_id for user_id, _ in entries] if sent else []
 
     async def try_ban(self,guild,user_id):
         try:
@@ -117,28 +216,154 @@ class SyncBlacklistsExtension(Extension):
         except (interactions.errors.Forbidden, interactions.errors.HTTPException, Exception) as e:
             print(f"Error banning user {user_id} in guild {guild.id}: {e}")
             return False
+
+    async def try_unban(self, guild, user_id):
+        try:
+            await guild.unban(user_id, reason="Removed from the blacklist.")
+            return True
+        except interactions.errors.NotFound:
+            return True
+        except (interactions.errors.Forbidden, interactions.errors.HTTPException, Exception) as e:
+            print(f"Error unbanning user {user_id} in guild {guild.id}: {e}")
+            return False
+
+    async def bulk_ban(self, guild, user_ids, reason="Blacklisted by the bot."):
+        """
+        Bans user_ids in batches through Discord's bulk-ban endpoint.
+        IDs the endpoint reports as failed, and whole batches it rejects (for example
+        when the bot lacks Manage Server), are checked against the guild's existing bans:
+        users already banned count as banned, and only the rest are retried one at a time
+        with try_ban. Returns the (banned, failed) user_id lists.
+        """
+        banned, failed = [], []
+        existing_bans = None
+        for i in range(0, len(user_ids), self.BULK_BAN_LIMIT):
+            batch = [str(user_id) for user_id in user_ids[i:i + self.BULK_BAN_LIMIT]]
+            try:
+                result = await self.bot.http.request(
+                    Route("POST", "/guilds/{guild_id}/bulk-ban", guild_id=guild.id),
+                    payload={"user_ids": batch, "delete_message_seconds": 0},
+                    reason=reason,
+                )
+                banned += [str(user_id) for user_id in result.get("banned_users", [])]
+                retry = [str(user_id) for user_id in result.get("failed_users", [])]
+            except interactions.errors.HTTPException as e:
+                print(f"Bulk ban failed in guild {guild.id}, falling back to single bans: {e}")
+                retry = batch
+            if retry and existing_bans is None:
+                # Discord reports users who are already banned as failed, so look them up once.
+                existing_bans = await self.get_banned_ids(guild)
+            for user_id in retry:
+                if user_id in existing_bans: banned.append(user_id)
+                elif await self.try_ban(guild, user_id): banned.append(user_id)
+                else: failed.append(user_id)
+        return banned, failed
+
+    async def get_banned_ids(self, guild):
+        """
+        Returns the IDs of every user banned in the guild, read 1000 bans per request.
+        Returns an empty set if the bans cannot be read, so callers fall back to banning each user.
+        """
+        banned_ids = set()
+        after = None
+        try:
+            while True:
+                bans = await self.bot.http.get_guild_bans(guild.id, after=after, limit=1000)
+                banned_ids.update(str(ban["user"]["id"]) for ban in bans)
+                if len(bans) < 1000:
+                    return banned_ids
+                after = bans[-1]["user"]["id"]
+        except interactions.errors.HTTPException as e:
+            print(f"Error reading bans in guild {guild.id}: {e}")
+            return set()
+
+    async def apply_ban_delta(self, guild, blacklisted_ids, skip_whitelisted=False):
+        """
+        Bans the blacklisted users this guild has not been banned for yet and lifts
+        bans for users that have since left the blacklist, using the per-guild
+        applied set in db_servers. Returns the (banned, failed, unbanned) user_id lists.
+        """
+        applied_bans = await self.db_servers.get_guild_applied(str(guild.id), kind="bans")
+        to_ban = sorted(blacklisted_ids - applied_bans)
+        to_unban = sorted(applied_bans - blacklisted_ids)
+        if skip_whitelisted:
+            whitelisted = await self.filter_whitelisted(to_ban)
+            to_ban = [user_id for user_id in to_ban if user_id not in whitelisted]
+        banned, failed = await self.bulk_ban(guild, to_ban)
+        unbanned = []
+        for user_id in to_unban:
+            if await self.try_unban(guild, user_id): unbanned.append(user_id)
+        await self.db_servers.add_guild_applied(str(guild.id), banned, kind="bans")
+        await self.db_servers.remove_guild_applied(str(guild.id), unbanned, kind="bans")
+        return banned, failed, unbanned
+
+    def format_failed_bans(self, failed):
+        if not failed:
+            return ""
+        shown = ", ".join(f"`{user_id}`" for user_id in failed[:20])
+        more = f" and {len(failed) - 20} more" if len(failed) > 20 else ""
+        return f"\nFailed to ban {len(failed)} users: {shown}{more}"
     
     @interactions.slash_command(name="syncbans", description="Syncs the bot's blacklists to the channel and server.")
     async def syncbans(self, ctx: interactions.SlashContext):
         if not await self.is_user_whitelisted(ctx.author.id):
             return await ctx.send("You are not whitelisted!", ephemeral=True)
-        await ctx.defer(ephemeral=True)
-        keys_values: Dict[str, Dict[str, str]] = self.db.list_all_users_info()
-        if not keys_values: return await ctx.send("There are no blacklisted users.", ephemeral=True)
         guild = ctx.guild
         if not guild: return await ctx.send("This command cannot be used in DMs.", ephemeral=True)
         if not guild.me.guild_permissions.BAN_MEMBERS: return await ctx.send("I do not have permission to ban members in this server.", ephemeral=True)
-        current_sync_hash: str = sha256(str(keys_values).encode('utf-8')).hexdigest()
-        print(f"current_sync_hash: {current_sync_hash}")
-        if self.db_servers.check_if_guild_synced(str(guild.id), current_sync_hash):
-            sync_details: Dict[str, str] = self.db_servers.get_sync_details(str(guild.id))
+        current_sync_hash: str = await self.db.get_blacklist_version()
+        if await self.db_servers.check_if_guild_synced(str(guild.id), current_sync_hash):
+            sync_details: Dict[str, str] = await self.db_servers.get_sync_details(str(guild.id))
             print(f"sync_details: {sync_details}")
             return await ctx.send(f"Blacklist in this guild is already up to date. Channel ID: {sync_details.get('channel_id', 'N/A')}, Users Synced: {sync_details.get('count', 'N/A')}", ephemeral=True)
-        guild_synced_count: int = 0
-        for user_id in keys_values.keys():
-            if not await self.is_user_whitelisted(user_id):
-                if await self.try_ban(guild, user_id): guild_synced_count += 1
-        await ctx.send(f"Synced {guild_synced_count} blacklisted users in this guild.", ephemeral=True)
+        job_id = await self.jobs.enqueue("syncbans", guild_id=str(guild.id), requested_by=ctx.author.display_name)
+        await ctx.send(f"Queued ban sync job `{job_id}`. Use /sync_status to check on it.", ephemeral=True)
+
+    async def run_syncbans(self, job_id, params):
+        """
+        Job handler for /syncbans. Re-running it only applies bans the guild is still missing.
+        """
+        guild = self.bot.get_guild(params["guild_id"])
+        if not guild:
+            raise LookupError(f"guild {params['guild_id']} is not available")
+        blacklisted_ids = await self.db.list_user_ids()
+        await self.jobs.update(job_id, stage="bans", total=len(blacklisted_ids))
+        banned, failed, unbanned = await self.apply_ban_delta(guild, blacklisted_ids, skip_whitelisted=True)
+        await self.jobs.update(job_id, banned=len(banned), failed=len(failed), unbanned=len(unbanned))
+        if not blacklisted_ids and not unbanned: return "There are no blacklisted users."
+        return f"Synced {len(banned)} new bans and {len(unbanned)} unbans in this guild.{self.format_failed_bans(failed)}"
+
+    @interactions.slash_command(name="sync_status", description="Shows the progress of a queued sync job.")
+    @interactions.slash_option(
+        name="job_id",
+        description="The job ID returned when the sync was queued",
+        required=True,
+        opt_type=interactions.OptionType.STRING,
+    )
+    async def sync_status(self, ctx: interactions.SlashContext, job_id: str):
+        if not await self.is_user_whitelisted(ctx.author.id):
+            return await ctx.send("You are not whitelisted!", ephemeral=True)
+        job = await self.jobs.get(job_id.strip())
+        if not job:
+            return await ctx.send(f"No job found with ID `{job_id}`. Finished jobs are kept for 7 days.", ephemeral=True)
+        progress = ", ".join(f"{field}: {job[field]}" for field in ("stage", "total", "banned", "failed", "unbanned", "posted") if field in job)
+        updated = datetime.datetime.fromtimestamp(float(job["updated_at"])).strftime("%Y-%m-%d %H:%M:%S")
+        embed = Embed(
+            title=f"Job {job_id}",
+            color=Color.random(),
+            fields=[
+                EmbedField(name="Kind", value=job["kind"], inline=True),
+                EmbedField(name="Status", value=job["status"], inline=True),
+                EmbedField(name="Attempts", value=job.get("attempts", "0"), inline=True),
+                EmbedField(name="Progress", value=progress or "N/A", inline=False),
+            ],
+            footer=f"Last updated {updated}",
+        )
+        if job.get("result"):
+            embed.add_field(name="Result", value=job["result"][:1024], inline=False)
+        if job.get("error"):
+            embed.add_field(name="Last error", value=job["error"][:1024], inline=False)
+        await ctx.send(embed=embed, ephemeral=True)
     
     @interactions.slash_command(name="purge", description="purges all embeds and messages in channel")
     async def purge(self, ctx: interactions.SlashContext):
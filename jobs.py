@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from database import AsyncRedisDB
+from utils import logutils
+
+logger = logutils.CustomLogger(__name__)
+
+class JobQueue:
+    """
+    Durable background jobs on a Redis Stream in db 2.
+    Commands enqueue a job and return its ID right away; a worker reads the stream through
+    a consumer group. A job's status, progress and result live in the JOB_KEY hash for /sync_status.
+
+    Handlers act on the guilds of the process that runs them, so jobs must be consumed by a
+    single process that holds every guild. Every process starts a worker, but only the one
+    holding the WORKER_LEASE_KEY lease reads the stream; the others stand by and take over
+    once it lapses, reclaiming the jobs the previous holder left pending.
+
+    An entry is only acknowledged once its handler finishes. If the handler raises, or the
+    process dies mid-job, the entry stays pending and is reclaimed after CLAIM_IDLE_MS and
+    run again, up to MAX_ATTEMPTS times. Handlers must therefore be safe to re-run; the
+    sync handlers get this from the per-guild applied sets, which act as their checkpoints.
+
+    The consuming process runs up to MAX_CONCURRENT_JOBS handlers at once, so a long sync does not
+    hold up the blacklist announcements queued behind it.
+    """
+    STREAM_KEY = "jobs"
+    GROUP = "workers"
+    JOB_KEY = "job:{}"
+    STREAM_MAXLEN = 10000
+    JOB_TTL = 7 * 24 * 60 * 60
+    MAX_ATTEMPTS = 3
+    CLAIM_IDLE_MS = 60000
+    READ_BLOCK_MS = 5000
+    RESTART_DELAY = 5
+    MAX_CONCURRENT_JOBS = 4
+    WORKER_LEASE_KEY = "jobs:worker"
+    WORKER_LEASE_MS = 30000
+
+    def __init__(self, db=2):
+        self.db = AsyncRedisDB(db=db)
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._handlers = {}
+        self._start_lock = asyncio.Lock()
+        self._worker = None
+        self._slots = asyncio.Semaphore(self.MAX_CONCURRENT_JOBS)
+        self._tasks = set()
+        self._lease_holder = False
+        self._lease = None
+
+    def register(self, kind, handler):
+        """
+        Registers the coroutine function handler(job_id, params) that runs jobs of this kind.
+        Whatever string it returns is stored as the job's result.
+        """
+        self._handlers[kind] = handler
+
+    async def start(self):
+        """
+        Creates the consumer group if needed and starts the worker. Safe to call more than once.
+        """
+        async with self._start_lock:
+            if self._worker is not None:
+                return
+            try:
+                await self.db.redis.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            await self._renew_lease()
+            self._lease = asyncio.create_task(self._keep_lease())
+            self._worker = asyncio.create_task(self._run())
+
+    async def enqueue(self, kind, **params):
+        """
+        Queues a job and returns its ID.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        async with self.db.redis.pipeline(transaction=True) as pipeline:
+            pipeline.hset(self.JOB_KEY.format(job_id), mapping={
+                "kind": kind,
+                "params": json.dumps(params),
+                "status": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            })
+            pipeline.expire(self.JOB_KEY.format(job_id), self.JOB_TTL)
+            pipeline.xadd(self.STREAM_KEY, {"job_id": job_id}, maxlen=self.STREAM_MAXLEN, approximate=True)
+            await pipeline.execute()
+        return job_id
+
+    async def get(self, job_id):
+        """
+        Returns the job's fields as a dict, with params decoded, or None if it is unknown or expired.
+        """
+        job = await self.db.redis.hgetall(self.JOB_KEY.format(job_id))
+        if not job:
+            return None
+        job = {key.decode('utf-8'): value.decode('utf-8') for key, value in job.items()}
+        job["params"] = json.loads(job.get("params", "{}"))
+        return job
+
+    async def update(self, job_id, **fields):
+        """
+        Records progress on a job, e.g. update(job_id, stage="posts", posted=20).
+        """
+        await self.db.redis.hset(self.JOB_KEY.format(job_id), mapping={**fields, "updated_at": time.time()})
+
+    async def _renew_lease(self):
+        redis = self.db.redis
+        if await redis.set(self.WORKER_LEASE_KEY, self.consumer, nx=True, px=self.WORKER_LEASE_MS):
+            self._lease_holder = True
+        elif await redis.get(self.WORKER_LEASE_KEY) == self.consumer.encode('utf-8'):
+            self._lease_holder = bool(await redis.pexpire(self.WORKER_LEASE_KEY, self.WORKER_LEASE_MS))
+        else:
+            self._lease_holder = False
+
+    async def _keep_lease(self):
+        # Renewed independently of the worker, so busy slots never let the lease lapse.
+        while True:
+            await asyncio.sleep(self.WORKER_LEASE_MS / 3000)
+            try:
+                await self._renew_lease()
+            except Exception as e:
+                self._lease_holder = False
+                logger.error(f"Job worker lease renewal failed: {e}")
+
+    async def _run(self):
+        while True:
+            if not self._lease_holder:
+                await asyncio.sleep(self.WORKER_LEASE_MS / 3000)
+                continue
+            # Only read once a slot is free, so a job is never claimed without room to run it.
+            await self._slots.acquire()
+            try:
+                entry = await self._next_entry()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"Job worker failed, restarting: {e}")
+                await asyncio.sleep(self.RESTART_DELAY)
+                continue
+            if entry is None:
+                self._slots.release()
+                continue
+            # Keep a reference so the task is not garbage-collected while it runs.
+            task = asyncio.create_task(self._process_in_slot(*entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _next_entry(self):
+        # Entries left pending by a failed handler or a dead process come first.
+        _, entries, *_ = await self.db.redis.xautoclaim(
+            self.STREAM_KEY, self.GROUP, self.consumer,
+            min_idle_time=self.CLAIM_IDLE_MS, start_id="0-0", count=1,
+        )
+        if not entries:
+            response = await self.db.redis.xreadgroup(
+                self.GROUP, self.consumer, {self.STREAM_KEY: ">"},
+                count=1, block=self.READ_BLOCK_MS,
+            )
+            entries = response[0][1] if response else []
+        return entries[0] if entries else None
+
+    async def _process_in_slot(self, entry_id, fields):
+        try:
+            await self._process(entry_id, fields)
+        except Exception as e:
+            # The entry stays pending and is reclaimed after CLAIM_IDLE_MS.
+            logger.error(f"Job entry {entry_id} could not be processed: {e}")
+        finally:
+            self._slots.release()
+
+    async def _process(self, entry_id, fields):
+        job_id = fields[b"job_id"].decode('utf-8') if fields else None
+        job = await self.get(job_id) if job_id else None
+        if job is None or job["status"] in ("done", "failed"):
+            await self.db.redis.xack(self.STREAM_KEY, self.GROUP, entry_id)
+            return
+
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            await self.update(job_id, status="failed", error=f"no handler for {job['kind']} jobs")
+            await self.db.redis.xack(self.STREAM_KEY, self.GROUP, entry_id)
+            return
+
+        attempts = await self.db.redis.hincrby(self.JOB_KEY.format(job_id), "attempts", 1)
+        await self.update(job_id, status="running")
+        heartbeat = asyncio.create_task(self._heartbeat(entry_id))
+        try:
+            result = await handler(job_id, job["params"])
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed on attempt {attempts}: {e}")
+            if attempts < self.MAX_ATTEMPTS:
+                # Left pending; _run reclaims it once CLAIM_IDLE_MS has passed.
+                await self.update(job_id, status="retrying", error=str(e) or type(e).__name__)
+                return
+            await self.update(job_id, status="failed", error=str(e) or type(e).__name__)
+        else:
+            await self.update(job_id, status="done", result=result or "")
+            # Drop the error a failed earlier attempt left behind.
+            await self.db.redis.hdel(self.JOB_KEY.format(job_id), "error")
+        finally:
+            heartbeat.cancel()
+        await self.db.redis.xack(self.STREAM_KEY, self.GROUP, entry_id)
+
+    async def _heartbeat(self, entry_id):
+        # Re-claiming our own entry resets its idle time, so long jobs are not stolen.
+        while True:
+            await asyncio.sleep(self.CLAIM_IDLE_MS / 3000)
+            try:
+                await self.db.redis.xclaim(self.STREAM_KEY, self.GROUP, self.consumer, 0, [entry_id], justid=True)
+            except Exception as e:
+                logger.error(f"Job heartbeat for entry {entry_id} failed: {e}")
+
+
+_job_queue = None
+
+def get_job_queue():
+    """
+    Returns the process-wide JobQueue shared by all extensions.
+    """
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from utils import logutils
+from utils.images import THUMBNAIL_PREFIX
+
+logger = logutils.CustomLogger(__name__)
+
+class ProofImageCache:
+    """
+    Size-bounded on-disk LRU cache of proof images for "View Images Direct".
+    Entries are keyed by Drive file ID and modifiedTime, so an edited image is fetched
+    again while untouched ones are served from disk. Misses are downloaded concurrently,
+    and concurrent requests for the same folder share a single fetch.
+    """
+    DEFAULT_DIRECTORY = os.path.join('cache', 'proof_images')
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+    MAX_IMAGES = 10
+
+    def __init__(self, drive, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.drive = drive
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pending = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # Rebuilds LRU order from the files left by a previous run, oldest use first.
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.part'):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+
+    def _key(self, file):
+        modified = re.sub(r'\D', '', file.get('modifiedTime', ''))
+        extension = os.path.splitext(file['name'])[1]
+        return f"{self.drive.content_id(file)}-{modified}{extension}"
+
+    async def get_folder_images(self, folder_id):
+        """
+        Returns (path, file name) pairs for up to MAX_IMAGES images in a Drive folder.
+        """
+        pending = self._pending.get(folder_id)
+        if pending is None:
+            pending = self._pending[folder_id] = asyncio.ensure_future(self._fetch_folder(folder_id))
+            pending.add_done_callback(lambda _: self._pending.pop(folder_id, None))
+        # Shielded so one caller giving up does not cancel the fetch for the others.
+        return await asyncio.shield(pending)
+
+    async def _fetch_folder(self, folder_id):
+        files = await self.drive.list_files(folder_id, images_only=True)
+        # Images uploaded since uploads were normalized have a thumbnail beside them; serve
+        # those, and the originals of older images and of ones that could not be processed.
+        thumbnails = {
+            os.path.splitext(file['name'][len(THUMBNAIL_PREFIX):])[0]: file
+            for file in files if file['name'].startswith(THUMBNAIL_PREFIX)
+        }
+        files = [
+            thumbnails.get(os.path.splitext(file['name'])[0], file)
+            for file in files if not file['name'].startswith(THUMBNAIL_PREFIX)
+        ][:self.MAX_IMAGES]
+        paths = await asyncio.gather(*(self._get_file(file) for file in files))
+        return [(path, file['name']) for path, file in zip(paths, files)]
+
+    async def _get_file(self, file):
+        key = self._key(file)
+        path = os.path.join(self.directory, key)
+        if key in self._entries and os.path.exists(path):
+            self._entries.move_to_end(key)
+            os.utime(path)
+            return path
+
+        fd, part_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        os.close(fd)
+        try:
+            await self.drive.download_file(self.drive.content_id(file), part_path)
+            os.replace(part_path, path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        self._size += os.path.getsize(path) - self._entries.pop(key, 0)
+        self._entries[key] = os.path.getsize(path)
+        self._evict()
+        return path
+
+    def _evict(self):
+        # The most recently used entry is always kept, even if it alone exceeds max_bytes.
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error evicting cached proof image {key}: {e}")
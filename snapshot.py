@@ -0,0 +1,139 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from utils import logutils
+
+logger = logutils.CustomLogger(__name__)
+
+MAGIC = b"BLSNAP"
+FORMAT_VERSION = 1
+# magic, format version, blacklist version, record count. 24 bytes, so the arrays after it stay 8-byte aligned.
+HEADER = struct.Struct("<6sHQQ")
+FIELDS = ("username", "reason", "proof_link", "folder_id")
+DEFAULT_PATH = os.path.join('cache', 'blacklist.snap')
+
+
+def _to_little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+async def write_snapshot(db, path=DEFAULT_PATH):
+    """
+    Exports the blacklist in db to a snapshot file and returns the blacklist version it was taken at.
+
+    Layout after the header, all integers little-endian:
+      count u64 user IDs, sorted;
+      count * len(FIELDS) + 1 u64 offsets into the string table, one per field of each record in ID order;
+      the string table, every field UTF-8 encoded back to back.
+    The version is read before the records, so anything written during the export is also
+    returned by get_changes_since(version) and re-applied by readers.
+    """
+    version = int(await db.get_blacklist_version())
+    records = {}
+    async for user_id, user_data in db.iter_users_info():
+        if user_id.isdigit():
+            records[int(user_id)] = user_data
+
+    ids = array('Q', sorted(records))
+    offsets = array('Q', [0])
+    strings = bytearray()
+    for user_id in ids:
+        for field in FIELDS:
+            strings += records[user_id].get(field, '').encode('utf-8')
+            offsets.append(len(strings))
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, part_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, version, len(ids)))
+            file.write(_to_little_endian(ids).tobytes())
+            file.write(_to_little_endian(offsets).tobytes())
+            file.write(strings)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    logger.info(f"Wrote blacklist snapshot of {len(records)} users at version {version} to {path}")
+    return version
+
+
+class BlacklistSnapshot:
+    """
+    Read-only view of a snapshot file written by write_snapshot.
+    The file is memory-mapped and the ID and offset arrays are read in place, so opening it
+    costs nothing per record, lookups are a bisect over the mapped IDs, and the pages are
+    shared between every process on the host that maps the same file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, format_version, self.version, self.count = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} blacklist snapshot")
+            ids_end = HEADER.size + 8 * self.count
+            offsets_end = ids_end + 8 * (self.count * len(FIELDS) + 1)
+            if len(self._mmap) < offsets_end:
+                raise ValueError(f"{path} is truncated")
+            self._ids = memoryview(self._mmap)[HEADER.size:ids_end].cast('Q')
+            self._offsets = memoryview(self._mmap)[ids_end:offsets_end].cast('Q')
+            if sys.byteorder == 'big':
+                # The file is little-endian; big-endian hosts pay for a swapped copy instead.
+                self._ids = _to_little_endian(array('Q', self._ids))
+                self._offsets = _to_little_endian(array('Q', self._offsets))
+            self._strings = offsets_end
+        except BaseException:
+            self.close()
+            raise
+
+    def _index(self, user_id):
+        user_id = int(user_id)
+        index = bisect_left(self._ids, user_id)
+        if index < self.count and self._ids[index] == user_id:
+            return index
+        return None
+
+    def __contains__(self, user_id):
+        return self._index(user_id) is not None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def get(self, user_id):
+        """
+        Returns the record for user_id as stored in the snapshot, or None.
+        """
+        index = self._index(user_id)
+        if index is None:
+            return None
+        first = index * len(FIELDS)
+        return {
+            field: self._mmap[self._strings + self._offsets[first + i]:self._strings + self._offsets[first + i + 1]].decode('utf-8')
+            for i, field in enumerate(FIELDS)
+        }
+
+    def close(self):
+        for name in ('_ids', '_offsets'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, NamedTuple, Optional
+
+# Discord allows 50 requests per second globally; guild ban and channel message
+# routes are bucketed per guild / channel, and the interactions HTTP client already
+# waits out each bucket on its own. Bounding the number of guilds in flight keeps
+# the bot under the global limit while buckets for different guilds run in parallel.
+DEFAULT_CONCURRENCY = 10
+MAX_SUMMARY_LENGTH = 2000
+
+
+class FanOutResult(NamedTuple):
+    guild: Any
+    ok: bool
+    detail: Optional[str]
+
+
+async def fan_out(guilds, action, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Runs the coroutine function action(guild) for every guild, at most `concurrency` at a time.
+    Returns one FanOutResult per guild, in the order given. The detail is whatever
+    action returned on success, or the exception text on failure.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(guild):
+        async with semaphore:
+            try:
+                return FanOutResult(guild, True, await action(guild))
+            except Exception as e:
+                return FanOutResult(guild, False, str(e) or type(e).__name__)
+
+    return await asyncio.gather(*(run(guild) for guild in guilds))
+
+
+def summarize(results, title):
+    """
+    Formats fan-out results as a single message listing failures, then successes that
+    returned a note, trimmed to Discord's message limit.
+    """
+    succeeded = [result for result in results if result.ok]
+    failed = [result for result in results if not result.ok]
+    lines = [f"{title}: {len(succeeded)}/{len(results)} guilds succeeded."]
+    lines += [f"❌ {result.guild.name}: {result.detail}" for result in failed]
+    lines += [f"⚠️ {result.guild.name}: {result.detail}" for result in succeeded if result.detail]
+    summary = ""
+    for line in lines:
+        if len(summary) + len(line) + 1 > MAX_SUMMARY_LENGTH - 4:
+            summary += "\n..."
+            break
+        summary += ("\n" if summary else "") + line
+    return summary
@@ -0,0 +1,69 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+from PIL import Image, ImageOps
+
+MAX_DIMENSION = 2560
+# PNGs still larger than this after optimizing are stored as JPEG, unless they use transparency.
+MAX_PNG_BYTES = 1024 * 1024
+JPEG_QUALITY = 85
+THUMBNAIL_SIZE = (512, 512)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_PREFIX = "thumb-"
+POOL_WORKERS = 2
+
+_pool = None
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    extension: str
+    thumbnail: bytes
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def process_image(data):
+    """
+    Normalizes an uploaded proof image and renders its thumbnail. CPU-bound; runs in a worker process.
+    Still images are re-encoded without metadata, after applying their EXIF rotation, and
+    downscaled to MAX_DIMENSION. Animated GIFs are kept as they are so no frames are lost.
+    The thumbnail is a JPEG of at most THUMBNAIL_SIZE.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        thumbnail = ImageOps.exif_transpose(original).convert("RGB")
+        thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+        thumbnail = _encode(thumbnail, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+
+        if getattr(original, "is_animated", False):
+            return ProcessedImage(data, "image/gif", ".gif", thumbnail)
+
+        image = ImageOps.exif_transpose(original)
+        if max(image.size) > MAX_DIMENSION:
+            image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+        transparent = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+        if original.format != "JPEG":
+            png = _encode(image, "PNG", optimize=True)
+            if transparent or len(png) <= MAX_PNG_BYTES:
+                return ProcessedImage(png, "image/png", ".png", thumbnail)
+        return ProcessedImage(_encode(image.convert("RGB"), "JPEG", quality=JPEG_QUALITY, optimize=True), "image/jpeg", ".jpg", thumbnail)
+
+
+async def process_image_async(data):
+    """
+    Runs process_image on a shared process pool so it does not block the event loop.
+    """
+    global _pool
+    if _pool is None:
+        # Spawned rather than forked: the bot process already runs threads (the Drive pool,
+        # Redis), and forking a threaded process can deadlock the child.
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return await asyncio.get_running_loop().run_in_executor(_pool, process_image, data)
@@ -0,0 +1,81 @@
+import asyncio
+from collections.abc import Sequence
+from interactions.ext.paginators import Paginator
+
+
+class PageSource(Sequence):
+    """
+    Stand-in for Paginator.pages that renders one page at a time.
+    `render` is a coroutine function taking a page index and returning its Embed;
+    only the page currently on screen is kept in memory. Hold `lock` from choosing a page
+    until it has been rendered into a message, or a concurrent load can replace it.
+    """
+    def __init__(self, count, render):
+        self._count = count
+        self._render = render
+        self._index = None
+        self._page = None
+        self.lock = asyncio.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index != self._index:
+            raise LookupError(f"Page {index} has not been loaded")
+        return self._page
+
+    async def load(self, index):
+        if index != self._index:
+            self._page = await self._render(index)
+            self._index = index
+
+
+class LazyPaginator(Paginator):
+    """
+    Paginator backed by a PageSource, so pages are fetched and rendered only when shown.
+    The select menu is not supported, since it would need every page's title up front.
+    """
+    @classmethod
+    def create_from_source(cls, client, count, render, timeout=0):
+        return cls(client, pages=PageSource(count, render), timeout_interval=timeout)
+
+    async def send(self, ctx, **kwargs):
+        async with self.pages.lock:
+            await self.pages.load(self.page_index)
+            return await super().send(ctx, **kwargs)
+
+    async def update(self):
+        async with self.pages.lock:
+            await self.pages.load(self.page_index)
+            await super().update()
+
+    async def _on_button(self, ctx, *args, **kwargs):
+        if ctx.author.id != self.author_id:
+            return (
+                await ctx.send(self.wrong_user_message, ephemeral=True)
+                if self.wrong_user_message
+                else await ctx.defer(edit_origin=True)
+            )
+        if self._timeout_task:
+            self._timeout_task.ping.set()
+        if ctx.custom_id.split("|")[1] == "callback":
+            return await self.callback(ctx) if self.callback else None
+
+        # Clicks are handled one at a time, so each moves from the page the last one showed.
+        async with self.pages.lock:
+            match ctx.custom_id.split("|")[1]:
+                case "first":
+                    self.page_index = 0
+                case "last":
+                    self.page_index = len(self.pages) - 1
+                case "next":
+                    if (self.page_index + 1) < len(self.pages):
+                        self.page_index += 1
+                case "back":
+                    if self.page_index >= 1:
+                        self.page_index -= 1
+
+            await self.pages.load(self.page_index)
+            await ctx.edit_origin(**self.to_dict())
+        return None
@@ -0,0 +1,38 @@
+import asyncio
+import inspect
+from utils import logutils
+
+logger = logutils.CustomLogger(__name__)
+
+RESUBSCRIBE_DELAY = 5
+
+
+async def _call(callback, *args):
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def listen_forever(redis, channel, on_subscribe, on_message, on_failure=None):
+    """
+    Subscribes to channel and passes the decoded data of every message to on_message.
+    on_subscribe runs after each (re)subscription and before any message is handled, so a
+    reload done there cannot miss an update published in between. If the connection drops,
+    on_failure runs and the channel is subscribed to again after RESUBSCRIBE_DELAY.
+    Callbacks may be plain or coroutine functions. Runs until cancelled.
+    """
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                await _call(on_subscribe)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await _call(on_message, message["data"].decode('utf-8'))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if on_failure is not None:
+                await _call(on_failure)
+            logger.error(f"Listener for {channel} failed, resubscribing: {e}")
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
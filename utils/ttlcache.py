@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import time
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded mapping whose entries expire `ttl` seconds after they are stored.
+    The least recently used entry is evicted once `maxsize` is reached.
+
+    `generation` is bumped by every invalidation; a reader that captured it before
+    fetching from the backing store passes it to `set`, and the store is skipped if
+    an invalidation raced the fetch, so a stale value is never cached.
+    """
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, generation=None):
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,103 @@
+import asyncio
+from database import AsyncRedisDB
+from utils.pubsub import listen_forever
+
+class WhitelistCache:
+    """
+    In-process copy of the whitelist set stored in db 1.
+    Loaded once at startup and kept current by /whitelist and /unwhitelist; every write
+    is also published on UPDATES_CHANNEL so other bot processes apply it too.
+    """
+    WHITELIST_KEY = "whitelisted_users"
+    UPDATES_CHANNEL = "whitelist_updates"
+
+    def __init__(self, db=1):
+        self.db = AsyncRedisDB(db=db)
+        self._members = set()
+        self._ready = False
+        self._start_lock = asyncio.Lock()
+        self._listener = None
+
+    async def start(self):
+        """
+        Subscribes to whitelist updates and loads the set. Safe to call more than once.
+        """
+        async with self._start_lock:
+            if self._listener is not None:
+                return
+            ready = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(ready))
+            await ready.wait()
+
+    async def _listen(self, ready):
+        async def subscribed():
+            await self._reload()
+            ready.set()
+
+        def failed():
+            self._ready = False
+            ready.set()
+
+        await listen_forever(self.db.redis, self.UPDATES_CHANNEL, subscribed, self._apply, failed)
+
+    async def _reload(self):
+        self._members = {user_id.decode('utf-8') for user_id in await self.db.redis.smembers(self.WHITELIST_KEY)}
+        self._ready = True
+
+    def _apply(self, update):
+        action, _, user_id = update.partition(":")
+        if action == "add":
+            self._members.add(user_id)
+        elif action == "remove":
+            self._members.discard(user_id)
+
+    async def contains(self, user_id):
+        await self.start()
+        if not self._ready:
+            return bool(await self.db.redis.sismember(self.WHITELIST_KEY, str(user_id)))
+        return str(user_id) in self._members
+
+    async def filter(self, user_ids):
+        """
+        Returns the whitelisted subset of user_ids.
+        """
+        await self.start()
+        if not self._ready:
+            return await self.db.filter_members(self.WHITELIST_KEY, user_ids)
+        return {str(user_id) for user_id in user_ids if str(user_id) in self._members}
+
+    async def members(self):
+        await self.start()
+        if not self._ready:
+            return {user_id.decode('utf-8') for user_id in await self.db.redis.smembers(self.WHITELIST_KEY)}
+        return set(self._members)
+
+    async def add(self, user_id):
+        """
+        Adds a user to the whitelist. Returns False if they were already on it.
+        """
+        added = await self.db.redis.sadd(self.WHITELIST_KEY, str(user_id))
+        self._apply(f"add:{user_id}")
+        await self.db.redis.publish(self.UPDATES_CHANNEL, f"add:{user_id}")
+        return bool(added)
+
+    async def remove(self, user_id):
+        """
+        Removes a user from the whitelist. Returns False if they were not on it.
+        """
+        removed = await self.db.redis.srem(self.WHITELIST_KEY, str(user_id))
+        self._apply(f"remove:{user_id}")
+        await self.db.redis.publish(self.UPDATES_CHANNEL, f"remove:{user_id}")
+        return bool(removed)
+
+
+_whitelist = None
+
+def get_whitelist():
+    """
+    Returns the process-wide WhitelistCache shared by all extensions.
+    """
+    global _whitelist
+    if _whitelist is None:
+        _whitelist = WhitelistCache()
+    return _whitelist